@@ -1,27 +1,35 @@
+import hashlib
 import json
 import os
-from collections.abc import Iterable
+import sys
+from collections.abc import Iterable, Mapping
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 import logging
 from uuid import uuid4
 
+import orjson
+
+from celery import group
 from django import forms
 from django.conf import settings
 from django.contrib import admin, messages
 from django.contrib.admin import helpers
-from django.contrib.admin.views.main import SEARCH_VAR
+from django.contrib.admin.views.main import SEARCH_VAR, ChangeList
 from django.contrib.admin.widgets import AdminSplitDateTime
 from django.core.exceptions import PermissionDenied
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.files.storage import default_storage
-from django.http import JsonResponse
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
-from django.urls import NoReverseMatch, path, reverse
+from django.urls import NoReverseMatch, get_script_prefix, path, reverse
 from django.db.models import Q
+from django.db.models.functions import MD5, Substr
 from django.utils import timezone
 from django.utils.formats import date_format
+from django.utils.functional import cached_property
 from django.utils.html import format_html, format_html_join
 from django.utils.text import Truncator
 from django.utils.translation import gettext, ngettext
@@ -31,6 +39,7 @@ from django.contrib.admin.templatetags.admin_urls import admin_urlname
 from . import services
 from .models import Channel, ChannelSource, DraftPost, HistoryPost, Post, PostMedia, ScheduledPost
 from .tasks import (
+    task_assign_auto_slot,
     task_gpt_generate_for_channel,
     task_gpt_generate_from_article,
     task_gpt_rewrite_post,
@@ -48,29 +57,83 @@ def enqueue_missing_drafts(channels: Iterable[Channel]) -> tuple[int, int]:
     Returns a tuple ``(queued_posts, affected_channels)``.
     """
 
-    queued = 0
-    affected = 0
-    for channel_id, need in iter_missing_draft_requirements(channels):
-        task_gpt_generate_for_channel.delay(channel_id, need)
-        queued += need
-        affected += 1
-    return queued, affected
+    requirements = list(iter_missing_draft_requirements(channels))
+    if requirements:
+        group(
+            task_gpt_generate_for_channel.s(channel_id, need)
+            for channel_id, need in requirements
+        ).apply_async()
+    queued = sum(need for _, need in requirements)
+    return queued, len(requirements)
 
 
 def media_public_url(media: PostMedia) -> str:
-    cache_path = (media.cache_path or "").strip()
+    return media_url_from_paths(media.cache_path, media.source_url)
+
+
+@lru_cache(maxsize=8)
+def _resolved_media_root(media_root: str) -> Path:
+    # Keyed by the setting value so override_settings(MEDIA_ROOT=...) still applies.
+    return Path(media_root).resolve()
+
+
+def media_url_from_paths(cache_path: str | None, source_url: str | None) -> str:
+    """Public URL for a cached file under MEDIA_ROOT, falling back to the source URL."""
+
+    cache_path = (cache_path or "").strip()
     if cache_path:
-        media_root = Path(settings.MEDIA_ROOT).resolve()
+        media_root = _resolved_media_root(str(settings.MEDIA_ROOT))
         try:
             rel = Path(cache_path).resolve().relative_to(media_root)
         except ValueError:
             rel = None
         if rel is not None:
             return settings.MEDIA_URL.rstrip("/") + "/" + rel.as_posix()
-    src = (media.source_url or "").strip()
+    src = (source_url or "").strip()
     return src
 
 
+def media_display_name(name_source: str | None) -> str:
+    """Last path segment of a cache path or URL, without building a Path object."""
+
+    return (name_source or "").rstrip("/").rpartition("/")[2]
+
+
+_URL_PK_PLACEHOLDER = 2147483647
+
+
+def admin_object_url_template(app_label: str, model_name: str, action: str) -> tuple[str, str] | None:
+    """Return the URL parts around the object id for an admin object view.
+
+    ``None`` means the view is not routed (e.g. the model is not registered).
+    The script prefix is added per call, so sub-path deployments get their own.
+    """
+
+    parts = _admin_object_path_template(app_label, model_name, action)
+    if parts is None:
+        return None
+    prefix, suffix = parts
+    return get_script_prefix() + prefix, suffix
+
+
+@lru_cache(maxsize=None)
+def _admin_object_path_template(app_label: str, model_name: str, action: str) -> tuple[str, str] | None:
+    try:
+        url = reverse(f"admin:{app_label}_{model_name}_{action}", args=[_URL_PK_PLACEHOLDER])
+    except NoReverseMatch:
+        return None
+    prefix, _, suffix = url.rpartition(str(_URL_PK_PLACEHOLDER))
+    # Only the prefix-free path is cached; it is the same for every SCRIPT_NAME.
+    return prefix.removeprefix(get_script_prefix()), suffix
+
+
+@lru_cache(maxsize=None)
+def field_choice_labels(model: type, field_name: str) -> dict:
+    """Map of stored values to display labels for a model field with choices."""
+
+    return dict(model._meta.get_field(field_name).choices or [])
+
+
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"}
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm", ".mpg", ".mpeg"}
 
@@ -89,6 +152,15 @@ def guess_media_type(name: str, content_type: str = "") -> str:
 
 ADMIN_PAGE_SIZE = 20
 
+# Values read for every media preview entry.
+PREVIEW_MEDIA_VALUES = ("type", "cache_path", "source_url", "resolver", "reference_data")
+
+# Long Channel columns the post form's channel dropdown never renders.
+CHANNEL_CHOICE_DEFERRED_FIELDS = ("style_prompt", "footer_text")
+
+# Interned status values shared by every card rendered on the changelist.
+_INTERNED_STATUSES = {value: sys.intern(value) for value in Post.Status.values}
+
 
 class RescheduleForm(forms.Form):
     schedule_mode = forms.ChoiceField(
@@ -203,10 +275,11 @@ class PostMediaInlineForm(forms.ModelForm):
             filename = f"post_media/{uuid4().hex}{ext}"
             stored_path = default_storage.save(filename, upload)
             previous = (self.instance.cache_path or "").strip()
-            if previous and os.path.exists(previous):
+            if previous:
                 try:
                     os.remove(previous)
                 except OSError:
+                    # Missing files (FileNotFoundError) are expected here.
                     pass
             try:
                 instance.cache_path = default_storage.path(stored_path)
@@ -475,6 +548,14 @@ class DraftImportForm(forms.Form):
         return False
 
 
+class PostTableChangeList(ChangeList):
+    """Changelist for tabular post lists, which only show a text excerpt."""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        qs = super().get_queryset(request, exclude_parameters)
+        return qs.defer("text", "source_metadata").annotate(short_text=Substr("text", 1, 81))
+
+
 class BasePostAdmin(admin.ModelAdmin):
     form = PostForm
     list_per_page = ADMIN_PAGE_SIZE
@@ -485,54 +566,99 @@ class BasePostAdmin(admin.ModelAdmin):
     change_list_template = "admin/posts/post_cards.html"
     change_form_template = "admin/posts/change_form.html"
     reschedule_template = "admin/posts/reschedule.html"
+    renders_post_cards = True
     inlines = [PostMediaInline]
 
-    def short(self, obj): return obj.text[:80] + ("…" if len(obj.text)>80 else "")
+    def short(self, obj):
+        text = getattr(obj, "short_text", None)
+        if text is None:
+            text = obj.text
+        return text[:80] + ("…" if len(text) > 80 else "")
+
+    def get_changelist(self, request, **kwargs):
+        if self.renders_post_cards or self._is_cards_partial_request(request):
+            return super().get_changelist(request, **kwargs)
+        return PostTableChangeList
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        qs = qs.select_related("channel", "approved_by").prefetch_related("media")
+        qs = qs.select_related("channel", "approved_by")
         return self.filter_queryset(qs)
 
     def filter_queryset(self, qs):
         return qs
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "channel":
+            kwargs.setdefault("queryset", Channel.objects.defer(*CHANNEL_CHOICE_DEFERRED_FIELDS))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
     def _object_url(self, obj, action):
         opts = self.model._meta
-        return reverse(f"admin:{opts.app_label}_{opts.model_name}_{action}", args=[obj.pk])
+        template = admin_object_url_template(opts.app_label, opts.model_name, action)
+        if template is None:
+            return reverse(f"admin:{opts.app_label}_{opts.model_name}_{action}", args=[obj.pk])
+        prefix, suffix = template
+        return f"{prefix}{obj.pk}{suffix}"
+
+    @cached_property
+    def _changelist_path(self) -> str:
+        opts = self.model._meta
+        url = reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+        # Only the prefix-free path is cached; the script prefix is added per call.
+        return url.removeprefix(get_script_prefix())
 
     def _changelist_url(self):
-        opts = self.model._meta
-        return reverse(f"admin:{opts.app_label}_{opts.model_name}_changelist")
+        return get_script_prefix() + self._changelist_path
 
     def _media_to_url(self, media: PostMedia) -> str:
         return media_public_url(media)
 
+    def _preview_media_entry(self, row: Mapping[str, Any]) -> dict | None:
+        cache_path = row["cache_path"] or ""
+        source_url = row["source_url"] or ""
+        url = media_url_from_paths(cache_path, source_url)
+        if not url:
+            return None
+        name_source = cache_path or source_url
+        reference = row["reference_data"]
+        return {
+            "src": url,
+            "type": row["type"] or "photo",
+            "name": media_display_name(name_source),
+            "resolver": row["resolver"] or "",
+            "reference": reference if isinstance(reference, dict) else {},
+            "source_url": source_url,
+            "cache_path": cache_path,
+        }
+
     def _build_preview_media(self, post: Post) -> list[dict]:
-        urls: list[dict] = []
-        media_manager = getattr(post, "media", None)
-        if media_manager is None:
-            return urls
-        for media in media_manager.all():
-            url = self._media_to_url(media)
-            if url:
-                name_source = media.cache_path or media.source_url or ""
-                filename = Path(name_source).name if name_source else ""
-                urls.append({
-                    "src": url,
-                    "type": media.type or "photo",
-                    "name": filename,
-                    "resolver": getattr(media, "resolver", ""),
-                    "reference": media.reference_data if isinstance(media.reference_data, dict) else {},
-                    "source_url": media.source_url or "",
-                    "cache_path": media.cache_path or "",
-                })
-        return urls
+        if post.pk is None:
+            return []
+        # Read plain column values instead of hydrating PostMedia instances.
+        entries = (self._preview_media_entry(row) for row in post.media.values(*PREVIEW_MEDIA_VALUES))
+        return [entry for entry in entries if entry is not None]
+
+    def _build_preview_media_by_post(self, posts: Iterable[Post]) -> dict[int, list[dict]]:
+        """Preview entries for a page of posts, read with a single query."""
+
+        pks = [post.pk for post in posts if post.pk is not None]
+        by_post: dict[int, list[dict]] = {}
+        if not pks:
+            return by_post
+        rows = (
+            PostMedia.objects.filter(post_id__in=pks)
+            .order_by("post_id", "order", "id")
+            .values("post_id", *PREVIEW_MEDIA_VALUES)
+        )
+        for row in rows:
+            entry = self._preview_media_entry(row)
+            if entry is not None:
+                by_post.setdefault(row["post_id"], []).append(entry)
+        return by_post
 
     def _choice_label(self, field_name: str, value: str) -> str:
-        field = self.model._meta.get_field(field_name)
-        choices = dict(field.choices or [])
-        return choices.get(value, value)
+        return field_choice_labels(self.model, field_name).get(value, value)
 
     def _serialize_media(self, media: list[dict]) -> str:
         data = json.dumps(media, cls=DjangoJSONEncoder)
@@ -554,8 +680,13 @@ class BasePostAdmin(admin.ModelAdmin):
         channel = obj.channel if obj and obj.channel_id else None
         if form_data:
             channel_id = (form_data.get("channel") or "").strip()
-            if channel_id:
-                channel = Channel.objects.filter(pk=channel_id).first() or channel
+            if channel_id and (channel is None or str(channel.pk) != channel_id):
+                # The bound form has usually resolved the channel already during validation.
+                cleaned_channel = (getattr(form, "cleaned_data", None) or {}).get("channel")
+                if cleaned_channel is not None and str(cleaned_channel.pk) == channel_id:
+                    channel = cleaned_channel
+                else:
+                    channel = Channel.objects.filter(pk=channel_id).first() or channel
 
         status_value = (form_data.get("status") if form_data and "status" in form_data else None) or (
             obj.status if obj else self.model._meta.get_field("status").get_default()
@@ -690,7 +821,7 @@ class BasePostAdmin(admin.ModelAdmin):
                     "has_spoiler": media.has_spoiler,
                     "source_url": media.source_url or "",
                     "media_public_url": public_url,
-                    "name": Path(name_source).name if name_source else "",
+                    "name": media_display_name(name_source),
                 }
             )
         return serialized
@@ -814,22 +945,8 @@ class BasePostAdmin(admin.ModelAdmin):
                 response.context_data.setdefault(
                     "post_cards_refresh_interval", self.get_cards_refresh_interval()
                 )
-                for post in cl.result_list:
-                    post.preview_media = self._build_preview_media(post)
-                    post.change_url = self._object_url(post, "change")
-                    post.delete_url = self._object_url(post, "delete")
-                    post.reschedule_url = self._object_url(post, "reschedule")
-                    post.rewrite_url = self._object_url(post, "rewrite")
-                    post.approve_url = self.get_approve_url(post)
-                    post.publish_now_url = self.get_publish_now_url(post)
-                    post.is_draft = post.status == Post.Status.DRAFT
-                    metadata = post.source_metadata if isinstance(getattr(post, "source_metadata", {}), dict) else {}
-                    post.source_entries = metadata.get("media", []) if isinstance(metadata, dict) else []
-                    rewrite_state = self._serialize_rewrite_state(post)
-                    post.rewrite_state = rewrite_state
-                    post.rewrite_status = rewrite_state.get("status")
-                    post.rewrite_requested_display = rewrite_state.get("requested_display")
-                    post.rewrite_completed_display = rewrite_state.get("completed_display")
+                if self.renders_post_cards or self._is_cards_partial_request(request):
+                    self._decorate_post_cards(cl.result_list)
                 self._store_filters_in_session(request, cl)
                 remembered = bool(request.session.get(self._filters_session_key()))
             response.context_data.setdefault("request", request)
@@ -838,6 +955,29 @@ class BasePostAdmin(admin.ModelAdmin):
                 return self._render_cards_partial(request, response.context_data)
         return response
 
+    def _decorate_post_cards(self, posts) -> None:
+        """Attach the per-card URLs, media previews and rewrite state used by post_card.html."""
+
+        draft_status = Post.Status.DRAFT.value
+        preview_media = self._build_preview_media_by_post(posts)
+        for post in posts:
+            post.status = _INTERNED_STATUSES.get(post.status, post.status)
+            post.preview_media = preview_media.get(post.pk, [])
+            post.change_url = self._object_url(post, "change")
+            post.delete_url = self._object_url(post, "delete")
+            post.reschedule_url = self._object_url(post, "reschedule")
+            post.rewrite_url = self._object_url(post, "rewrite")
+            post.approve_url = self.get_approve_url(post)
+            post.publish_now_url = self.get_publish_now_url(post)
+            post.is_draft = post.status == draft_status
+            metadata = post.source_metadata
+            post.source_entries = metadata.get("media", []) if isinstance(metadata, dict) else []
+            rewrite_state = self._serialize_rewrite_state(post)
+            post.rewrite_state = rewrite_state
+            post.rewrite_status = rewrite_state.get("status")
+            post.rewrite_requested_display = rewrite_state.get("requested_display")
+            post.rewrite_completed_display = rewrite_state.get("completed_display")
+
     def get_approve_url(self, post):
         return None
 
@@ -898,7 +1038,7 @@ class BasePostAdmin(admin.ModelAdmin):
             "media": self._serialize_media_state(post.media.all()),
             "rewrite": self._serialize_rewrite_state(post),
         }
-        return JsonResponse(data, encoder=DjangoJSONEncoder)
+        return HttpResponse(orjson.dumps(data), content_type="application/json")
 
     def reschedule_view(self, request, object_id):
         post = get_object_or_404(self.model, pk=object_id)
@@ -911,7 +1051,10 @@ class BasePostAdmin(admin.ModelAdmin):
             local_dt = timezone.localtime(post.scheduled_at, tzinfo)
             initial["scheduled_at"] = timezone.make_naive(local_dt, tzinfo)
 
-        form = RescheduleForm(request.POST or None, initial=initial)
+        if request.method == "POST":
+            form = RescheduleForm(request.POST, initial=initial)
+        else:
+            form = RescheduleForm(initial=initial)
 
         if request.method == "POST" and form.is_valid():
             mode = form.cleaned_data["schedule_mode"]
@@ -930,8 +1073,7 @@ class BasePostAdmin(admin.ModelAdmin):
                 post.save()
                 msg = "Zmieniono termin publikacji."
             self.message_user(request, msg, level=messages.SUCCESS)
-            changelist_url = reverse(f"admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist")
-            return redirect(changelist_url)
+            return redirect(self._changelist_url())
 
         context = {
             **self.admin_site.each_context(request),
@@ -940,7 +1082,7 @@ class BasePostAdmin(admin.ModelAdmin):
             "title": "Zmień termin publikacji",
             "form": form,
             "media": form.media,
-            "changelist_url": reverse(f"admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist"),
+            "changelist_url": self._changelist_url(),
         }
         return TemplateResponse(request, self.reschedule_template, context)
 
@@ -949,7 +1091,10 @@ class BasePostAdmin(admin.ModelAdmin):
         if not self.has_change_permission(request, post):
             raise PermissionDenied
 
-        form = RewritePromptForm(request.POST or None)
+        if request.method == "POST":
+            form = RewritePromptForm(request.POST)
+        else:
+            form = RewritePromptForm()
 
         if request.method == "POST" and form.is_valid():
             prompt = (form.cleaned_data.get("prompt") or "").strip() or DEFAULT_REWRITE_PROMPT
@@ -960,8 +1105,7 @@ class BasePostAdmin(admin.ModelAdmin):
                 "Zlecono korektę wpisu przy użyciu GPT.",
                 level=messages.INFO,
             )
-            changelist_url = reverse(f"admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist")
-            return redirect(changelist_url)
+            return redirect(self._changelist_url())
 
         context = {
             **self.admin_site.each_context(request),
@@ -971,13 +1115,15 @@ class BasePostAdmin(admin.ModelAdmin):
             "form": form,
             "media": form.media,
             "default_prompt": DEFAULT_REWRITE_PROMPT,
-            "changelist_url": reverse(f"admin:{self.model._meta.app_label}_{self.model._meta.model_name}_changelist"),
+            "changelist_url": self._changelist_url(),
         }
         return TemplateResponse(request, "admin/posts/rewrite.html", context)
 
     @admin.action(description="Uzupełnij drafty")
     def act_fill_to_target(self, request, qs):
-        channels = {p.channel for p in qs if getattr(p, "channel_id", None)} or set(Channel.objects.all())
+        channels = Channel.objects.filter(id__in=qs.order_by().values("channel_id"))
+        if not channels.exists():
+            channels = Channel.objects.all()
         queued, affected = enqueue_missing_drafts(channels)
         if queued:
             self.message_user(
@@ -994,8 +1140,28 @@ class BasePostAdmin(admin.ModelAdmin):
 
     @admin.action(description="Zatwierdź i nadaj slot AUTO")
     def act_approve(self, request, qs):
-        for p in qs:
-            services.approve_post(p, request.user)
+        post_ids = list(qs.values_list("id", flat=True))
+        if not post_ids:
+            return
+        # Stary slot jest kasowany, żeby task_publish_due nie opublikował wpisu,
+        # zanim zadanie w tle nada mu nowy.
+        updates = {
+            "status": Post.Status.APPROVED,
+            "schedule_mode": "AUTO",
+            "scheduled_at": None,
+            "expires_at": None,
+        }
+        if request.user.is_authenticated:
+            updates["approved_by"] = request.user
+        Post.objects.filter(id__in=post_ids).update(**updates)
+        # Sloty są liczone w tle; worker Celery działa sekwencyjnie, więc kolejne wpisy
+        # widzą już sloty zajęte przez poprzednie.
+        group(task_assign_auto_slot.s(post_id) for post_id in post_ids).apply_async()
+        self.message_user(
+            request,
+            f"Zatwierdzono {len(post_ids)} wpis(ów); sloty AUTO zostaną nadane w tle.",
+            level=messages.INFO,
+        )
 
     @admin.action(description="Przelicz slot AUTO")
     def act_schedule(self, request, qs):
@@ -1006,11 +1172,12 @@ class BasePostAdmin(admin.ModelAdmin):
     def act_publish_now(self, request, qs):
         from .tasks import publish_post
         allowed_statuses = {Post.Status.APPROVED, Post.Status.SCHEDULED}
-        for post in qs:
-            if post.status not in allowed_statuses:
-                continue
+        post_ids = []
+        for post in qs.filter(status__in=allowed_statuses):
             self._prepare_for_immediate_publication(post)
-            publish_post.delay(post.id)
+            post_ids.append(post.id)
+        if post_ids:
+            group(publish_post.s(post_id) for post_id in post_ids).apply_async()
 
     @admin.action(description="Usuń")
     def act_delete(self, request, qs):
@@ -1208,7 +1375,10 @@ class DraftPostAdmin(BasePostAdmin):
         if not self.has_add_permission(request):
             raise PermissionDenied
 
-        form = GptDraftRequestForm(request.POST or None, request.FILES or None)
+        if request.method == "POST":
+            form = GptDraftRequestForm(request.POST, request.FILES)
+        else:
+            form = GptDraftRequestForm()
 
         if request.method == "POST" and form.is_valid():
             channel: Channel = form.cleaned_data["channel"]
@@ -1235,7 +1405,10 @@ class DraftPostAdmin(BasePostAdmin):
         if not self.has_add_permission(request):
             raise PermissionDenied
 
-        form = DraftImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST":
+            form = DraftImportForm(request.POST, request.FILES)
+        else:
+            form = DraftImportForm()
 
         if request.method == "POST" and form.is_valid():
             entries: list[dict[str, Any]] = form.cleaned_data.get("drafts_file") or []
@@ -1395,6 +1568,7 @@ class ScheduledPostAdmin(BasePostAdmin):
 @admin.register(HistoryPost)
 class HistoryPostAdmin(BasePostAdmin):
     change_list_template = "admin/posts/post_history_list.html"
+    renders_post_cards = False
     list_display = (
         "id",
         "channel",
@@ -1446,9 +1620,14 @@ class PostMediaAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        self._related_posts_cache: dict[str, list[Post]] = {}
+        self._related_posts_cache: dict[tuple[str, str], tuple[Post, ...]] = {}
         return qs.select_related("post", "post__channel")
 
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        self._prime_related_posts_cache(changelist.result_list)
+        return changelist
+
     @admin.display(description="Wpis", ordering="post__id")
     def post_with_channel_display(self, obj: PostMedia) -> str:
         post = obj.post
@@ -1525,42 +1704,77 @@ class PostMediaAdmin(admin.ModelAdmin):
                 items.append(label)
         return format_html_join("<br>", "{}", ((item,) for item in items))
 
-    def _get_related_posts(self, obj: PostMedia) -> list[Post]:
+    @staticmethod
+    def _related_posts_key(obj: PostMedia) -> tuple[str, str] | None:
         ref = obj.reference_data or {}
         ref_url = ""
         if isinstance(ref, dict):
             ref_url = (ref.get("tg_post_url") or ref.get("original_url") or "").strip()
-        key = ref_url or (obj.source_url or "").strip()
-        if not key:
-            return []
-        cached = self._related_posts_cache.get(key)
-        if cached is not None:
-            return [post for post in cached if post.id != obj.post_id]
-        qs = Post.objects.select_related("channel").distinct()
         if ref_url:
-            qs = qs.filter(
-                Q(media__reference_data__contains={"tg_post_url": ref_url})
-                | Q(media__reference_data__contains={"original_url": ref_url})
-            )
-        else:
-            qs = qs.filter(media__source_url=obj.source_url)
-        posts = list(qs)
-        self._related_posts_cache[key] = posts
-        return [post for post in posts if post.id != obj.post_id]
+            return ("reference", ref_url)
+        source_url = (obj.source_url or "").strip()
+        if source_url:
+            return ("source", source_url)
+        return None
+
+    def _prime_related_posts_cache(self, media_items: Iterable[PostMedia]) -> None:
+        """Load related posts for a whole page of media with a single query."""
+
+        keys = {key for key in map(self._related_posts_key, media_items) if key}
+        keys.difference_update(self._related_posts_cache)
+        if not keys:
+            return
+        ref_urls = {url for kind, url in keys if kind == "reference"}
+        source_urls = {url for kind, url in keys if kind == "source"}
+
+        condition = Q()
+        if ref_urls:
+            condition |= Q(reference_data__tg_post_url__in=ref_urls)
+            condition |= Q(reference_data__original_url__in=ref_urls)
+        if source_urls:
+            # Matches the MD5(source_url) index; the plain comparison guards against collisions.
+            source_hashes = [hashlib.md5(url.encode()).hexdigest() for url in source_urls]
+            condition |= Q(source_url_md5__in=source_hashes, source_url__in=source_urls)
+
+        matches: dict[tuple[str, str], dict[int, Post]] = {key: {} for key in keys}
+        rows = (
+            PostMedia.objects.alias(source_url_md5=MD5("source_url"))
+            .filter(condition)
+            .select_related("post__channel")
+            .order_by("post_id")
+        )
+        for media in rows:
+            ref = media.reference_data if isinstance(media.reference_data, dict) else {}
+            hits = {
+                ("reference", ref[field])
+                for field in ("tg_post_url", "original_url")
+                if isinstance(ref.get(field), str) and ref[field] in ref_urls
+            }
+            if media.source_url in source_urls:
+                hits.add(("source", media.source_url))
+            for key in hits:
+                matches[key].setdefault(media.post_id, media.post)
+
+        for key, posts in matches.items():
+            self._related_posts_cache[key] = tuple(posts.values())
+
+    def _get_related_posts(self, obj: PostMedia) -> list[Post]:
+        key = self._related_posts_key(obj)
+        if key is None:
+            return []
+        if key not in self._related_posts_cache:
+            self._prime_related_posts_cache([obj])
+        cached = self._related_posts_cache.get(key, ())
+        return [post for post in cached if post.id != obj.post_id]
 
     def _reverse_post_change_url(self, post: Post, post_id: int) -> str | None:
         admin_models = [post.__class__, DraftPost, ScheduledPost, Post]
-        seen = set()
         for model in admin_models:
             opts = getattr(model, "_meta", None)
             if opts is None:
                 continue
-            key = (opts.app_label, opts.model_name)
-            if key in seen:
-                continue
-            seen.add(key)
-            try:
-                return reverse(f"admin:{opts.app_label}_{opts.model_name}_change", args=[post_id])
-            except NoReverseMatch:
-                continue
+            template = admin_object_url_template(opts.app_label, opts.model_name, "change")
+            if template is not None:
+                prefix, suffix = template
+                return f"{prefix}{post_id}{suffix}"
         return None
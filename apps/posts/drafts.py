@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from collections.abc import Iterable, Iterator
 
-from django.db.models import Count, Q
+from django.db.models import Count, Q, QuerySet
 
 from .models import Channel, Post
 
@@ -12,14 +12,14 @@ def iter_missing_draft_requirements(
 ) -> Iterator[tuple[int, int]]:
     """Yield ``(channel_id, missing_count)`` for channels below draft targets."""
 
-    channel_ids: set[int] | None = None
-    if channels is not None:
+    queryset = Channel.objects.all()
+    if isinstance(channels, QuerySet):
+        # Keep the selection in SQL instead of hydrating every Channel for its id.
+        queryset = queryset.filter(id__in=channels.order_by().values("id"))
+    elif channels is not None:
         channel_ids = {ch.id for ch in channels if getattr(ch, "id", None)}
         if not channel_ids:
             return
-
-    queryset = Channel.objects.all()
-    if channel_ids is not None:
         queryset = queryset.filter(id__in=channel_ids)
 
     annotated = (
@@ -30,6 +30,8 @@ def iter_missing_draft_requirements(
             )
         )
         .values("id", "draft_target_count", "draft_count")
+        # Stream rows (server-side cursor on PostgreSQL) instead of caching the whole result.
+        .iterator(chunk_size=500)
     )
 
     for entry in annotated:
@@ -4,6 +4,7 @@ import json
 from typing import Any
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
 
 from apps.posts import services
 from apps.posts.models import Channel
@@ -57,18 +58,24 @@ class Command(BaseCommand):
         self.stdout.write(prompts["user"])
 
     def _resolve_channel(self, reference: str) -> Channel:
+        lookup = Q(slug=reference)
         try:
             channel_id = int(reference)
         except (TypeError, ValueError):
-            channel = Channel.objects.filter(slug=reference).first()
-            if channel is None:
-                raise CommandError(f"Nie znaleziono kanału o slugu '{reference}'.")
-            return channel
+            channel_id = None
+        else:
+            lookup |= Q(id=channel_id)
 
-        try:
-            return Channel.objects.get(id=channel_id)
-        except Channel.DoesNotExist as exc:
-            raise CommandError(f"Nie znaleziono kanału o ID {reference}.") from exc
+        # Numeric slugs are allowed, so an ID and a slug can both match; the ID wins.
+        candidates = list(Channel.objects.filter(lookup)[:2])
+        for channel in candidates:
+            if channel.id == channel_id:
+                return channel
+        if candidates:
+            return candidates[0]
+        if channel_id is not None:
+            raise CommandError(f"Nie znaleziono kanału o ID {reference}.")
+        raise CommandError(f"Nie znaleziono kanału o slugu '{reference}'.")
 
     def _parse_article(self, raw: str | None) -> dict[str, Any] | None:
         if not raw:
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-16 08:05
+
+import django.db.models.fields.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0010_remove_channel_emoji_max_remove_channel_emoji_min"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="postmedia",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform("tg_post_url", "reference_data"),
+                name="postmedia_ref_tg_url_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="postmedia",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform("original_url", "reference_data"),
+                name="postmedia_ref_orig_url_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-16 08:06
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0011_postmedia_reference_url_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="postmedia",
+            index=models.Index(
+                django.db.models.functions.text.MD5("source_url"),
+                name="postmedia_source_url_md5_idx",
+            ),
+        ),
+    ]
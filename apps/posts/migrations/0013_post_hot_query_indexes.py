@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0012_postmedia_source_url_md5_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["channel", "status", "-created_at"], name="post_ch_stat_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["status", "scheduled_at"], name="post_status_sched_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                condition=models.Q(("status", "DRAFT")),
+                fields=["expires_at"],
+                name="post_expires_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0013_post_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="postmedia",
+            index=models.Index(fields=["post", "order", "id"], name="postmedia_post_order_idx"),
+        ),
+    ]
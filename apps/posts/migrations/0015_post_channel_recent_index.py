@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("posts", "0014_postmedia_post_order_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["channel", "-id"], name="post_channel_recent_idx"),
+        ),
+    ]
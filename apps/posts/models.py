@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import MD5
 from django.utils import timezone
 
 class Channel(models.Model):
@@ -95,15 +97,36 @@ class Post(models.Model):
     class Meta:
         verbose_name = "Wpis"
         verbose_name_plural = "Wpisy"
+        indexes = [
+            # Liczenie draftów per kanał i listy w panelu (kanał + status, od najnowszych).
+            models.Index(fields=["channel", "status", "-created_at"], name="post_ch_stat_created_idx"),
+            # Publikacja zaległych wpisów i sprzątanie przeterminowanych slotów.
+            models.Index(fields=["status", "scheduled_at"], name="post_status_sched_idx"),
+            # Wygasanie draftów; częściowy indeks obejmuje tylko DRAFT.
+            models.Index(fields=["expires_at"], name="post_expires_idx", condition=models.Q(status="DRAFT")),
+            # Ostatnie wpisy kanału do wykrywania duplikatów: status IN (...) obejmuje prawie
+            # wszystkie wiersze, więc indeks (kanał, -id) zwraca od razu gotowe LIMIT wierszy.
+            models.Index(fields=["channel", "-id"], name="post_channel_recent_idx"),
+        ]
 
     def save(self, *a, **kw):
         if self.status == self.Status.APPROVED and self.scheduled_at:
             self.status = self.Status.SCHEDULED
         if self.status == self.Status.DRAFT and not self.expires_at:
-            ttl = getattr(self.channel, "draft_ttl_days", 3)
+            ttl = self._draft_ttl_days()
             self.expires_at = timezone.now() + timezone.timedelta(days=ttl)
         super().save(*a, **kw)
 
+    def _draft_ttl_days(self) -> int:
+        if not self.channel_id:
+            return 3
+        if Post.channel.is_cached(self):
+            return self.channel.draft_ttl_days
+        # Jedno pole zamiast całego kanału; bez cache w procesie, bo zmiany TTL
+        # muszą być od razu widoczne we wszystkich workerach.
+        ttl = Channel.objects.filter(pk=self.channel_id).values_list("draft_ttl_days", flat=True).first()
+        return 3 if ttl is None else ttl
+
 
 class DraftPost(Post):
     class Meta:
@@ -144,3 +167,12 @@ class PostMedia(models.Model):
         ordering = ["order", "id"]
         verbose_name = "Medium wpisu"
         verbose_name_plural = "Media wpisu"
+        indexes = [
+            # Wyszukiwanie powiązanych wpisów po adresie posta źródłowego w panelu mediów.
+            models.Index(KeyTransform("tg_post_url", "reference_data"), name="postmedia_ref_tg_url_idx"),
+            models.Index(KeyTransform("original_url", "reference_data"), name="postmedia_ref_orig_url_idx"),
+            # Skrót zamiast samego URL-a: długie adresy przekraczają limit rozmiaru klucza btree.
+            models.Index(MD5("source_url"), name="postmedia_source_url_md5_idx"),
+            # post.media.all() sortuje po (order, id) – indeks zwraca wiersze już w tej kolejności.
+            models.Index(fields=["post", "order", "id"], name="postmedia_post_order_idx"),
+        ]
@@ -1,15 +1,26 @@
 import asyncio
+import atexit
+import concurrent.futures
+import json
 import logging
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, TypedDict
-from urllib.parse import urlparse
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TypedDict
 
+import redis
+from aiolimiter import AsyncLimiter
 from django.conf import settings
 
 try:
     from telethon import TelegramClient
-    from telethon.errors import RPCError
+    from telethon.errors import FloodWaitError, RPCError
     from telethon.sessions import StringSession
 except ImportError:  # pragma: no cover - optional dependency
     TelegramClient = None  # type: ignore[misc,assignment]
@@ -17,6 +28,12 @@ except ImportError:  # pragma: no cover - optional dependency
 
 logger = logging.getLogger(__name__)
 
+# Link do wiadomości: [https://]t.me/[s/]<kanał>/<id>[/...|?...|#...]
+_TG_URL_RE = re.compile(
+    r"^(?:https?://)?(?:www\.)?(?:t|telegram)\.me/(?:s/)?([^/?#]+)/(\d+)(?:[/?#]|$)",
+    re.IGNORECASE,
+)
+
 
 class TelegramResolverNotConfigured(RuntimeError):
     """Raised when Telegram resolver does not have required credentials."""
@@ -31,10 +48,159 @@ class _AlbumEntry(TypedDict):
     type: str
 
 
-_ALBUM_CACHE: Dict[Tuple[str, int], List[_AlbumEntry]] = {}
+@dataclass(frozen=True)
+class _ResolverConfig:
+    api_id: int
+    api_hash: str
+    session_string: str
+    session_path: str
+    session_dir: str
+    session_name: str
+
+
+class _CachedAlbum(NamedTuple):
+    lookup_key: str
+    entries: List[_AlbumEntry]
+
+
+# LRU of downloaded album parts not yet handed out, keyed by (chat, grouped_id).
+# Downloads fill it on the resolver loop thread while callers consume it from
+# their own threads, hence the lock.
+_ALBUM_CACHE: "OrderedDict[Tuple[str, int], _CachedAlbum]" = OrderedDict()
+_ALBUM_CACHE_LOCK = threading.Lock()
 _ALBUM_CACHE_LIMIT = 128
-_ALBUM_CACHE_LOOKUP: Dict[Tuple[str, int], str] = {}
-_ALBUM_CACHE_KEYS: Dict[str, Tuple[str, int]] = {}
+# Album downloads in progress on the resolver loop, keyed like the album cache.
+_INFLIGHT: Dict[Tuple[str, int], "asyncio.Future[None]"] = {}
+
+# With REDIS_URL set, album parts are shared through Redis instead, so a part
+# downloaded by one worker is handed out by the others (media volume is shared).
+_ALBUM_REDIS_PREFIX = "tg:album"
+_ALBUM_REDIS_TTL = 3600
+_ALBUM_REDIS: Any = None
+_ALBUM_REDIS_URL = ""
+_ALBUM_REDIS_TAKE: Any = None
+# Atomically removes and returns the first part of the requested type
+# (or the first part at all when no type matches).
+_ALBUM_REDIS_TAKE_SCRIPT = """
+local items = redis.call("LRANGE", KEYS[1], 0, -1)
+if #items == 0 then
+    return false
+end
+local pick = items[1]
+if ARGV[1] ~= "" then
+    for _, item in ipairs(items) do
+        if cjson.decode(item)["type"] == ARGV[1] then
+            pick = item
+            break
+        end
+    end
+end
+redis.call("LREM", KEYS[1], 1, pick)
+return pick
+"""
+_ALBUM_DOWNLOAD_CONCURRENCY = 4
+_ALBUM_MAX_ITEMS = 10
+# Documents are fetched in 1 MiB requests (Telethon defaults to 512 KiB).
+_STREAM_REQUEST_SIZE = 1024 * 1024
+# Document MIME prefix (first 6 characters) -> media type.
+_MIME_PREFIX_TYPES = {"image/": "photo", "video/": "video"}
+# Directories already created in this process (MEDIA_ROOT can differ per settings).
+_READY_DIRS: set = set()
+
+# Telegram odpowiada FLOOD_WAIT, gdy wysyłamy za dużo zapytań naraz. Ograniczamy
+# tempo (20 zapytań/s) i liczbę równoległych wywołań, którą AIMD zmniejsza po
+# każdym FLOOD_WAIT i powoli odbudowuje po szybkich odpowiedziach.
+_RPC_RATE_LIMIT = 20
+_FLOOD_WAIT_MAX_SLEEP = 120
+
+# One connected client per process, owned by a background event loop, so that
+# consecutive downloads skip the MTProto handshake.
+_LOOP_LOCK = threading.Lock()
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_CLIENT: Any = None
+_CLIENT_KEY: Optional["_ResolverConfig"] = None
+_CLIENT_LOCK: Optional[asyncio.Lock] = None
+_DISCONNECT_TIMEOUT = 2.0
+
+# Resolved peers per chat username. Entities carry session-bound access hashes,
+# so the cache is dropped together with the shared client.
+_ENTITY_CACHE: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+_ENTITY_CACHE_TTL = 3600.0
+_ENTITY_CACHE_LIMIT = 256
+
+
+class _AIMDLimiter:
+    """Concurrency cap with additive increase and multiplicative decrease."""
+
+    def __init__(
+        self,
+        limit: int,
+        *,
+        minimum: int = 1,
+        alpha: float = 0.5,
+        beta: float = 0.5,
+        target_latency: float = 2.0,
+    ) -> None:
+        self.maximum = limit
+        self.minimum = minimum
+        self.alpha = alpha
+        self.beta = beta
+        self.target_latency = target_latency
+        self.limit = float(limit)
+        self.active = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def cap(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    def increase(self) -> None:
+        self.limit = min(float(self.maximum), self.limit + self.alpha / max(self.limit, 1.0))
+
+    def decrease(self) -> None:
+        self.limit = max(float(self.minimum), self.limit * self.beta)
+
+    @asynccontextmanager
+    async def slot(self):
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition, self._loop, self.active = asyncio.Condition(), loop, 0
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.cap)
+            self.active += 1
+        started = time.monotonic()
+        try:
+            yield
+        except FloodWaitError:
+            self.decrease()
+            raise
+        else:
+            if time.monotonic() - started <= self.target_latency:
+                self.increase()
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._condition.notify_all()
+
+
+_RPC_RATE_LIMITER = AsyncLimiter(_RPC_RATE_LIMIT, 1)
+_RPC_CONCURRENCY = _AIMDLimiter(_ALBUM_DOWNLOAD_CONCURRENCY)
+
+
+async def _rpc(call, *args, **kwargs):
+    """Run a client call under the rate limit, waiting out one short FLOOD_WAIT."""
+
+    for attempt in range(2):
+        try:
+            async with _RPC_CONCURRENCY.slot():
+                async with _RPC_RATE_LIMITER:
+                    return await call(*args, **kwargs)
+        except FloodWaitError as exc:
+            if attempt or exc.seconds > _FLOOD_WAIT_MAX_SLEEP:
+                raise
+            logger.warning("Telegram FLOOD_WAIT %ss, ponawiam po odczekaniu.", exc.seconds)
+            await asyncio.sleep(exc.seconds + 0.1)
 
 
 def download_telegram_media(
@@ -45,26 +211,31 @@ def download_telegram_media(
 ) -> str:
     """Download Telegram media and return local file URI.
 
-    Requires TELEGRAM_RESOLVER_API_ID, TELEGRAM_RESOLVER_API_HASH and either
-    TELEGRAM_RESOLVER_SESSION (string session) or TELEGRAM_RESOLVER_SESSION_PATH.
+    Blocking wrapper around :func:`download_telegram_media_async` for sync callers.
     """
 
-    if TelegramClient is None:
-        raise TelegramResolverNotConfigured("telethon not installed")
+    return _wait_on_resolver_loop(
+        download_telegram_media_async(tg_post_url, media_type=media_type, caption=caption),
+        default="",
+        label=tg_post_url,
+    )
 
-    api_id_raw = os.getenv("TELEGRAM_RESOLVER_API_ID", "").strip()
-    api_hash = os.getenv("TELEGRAM_RESOLVER_API_HASH", "").strip()
-    session_string = os.getenv("TELEGRAM_RESOLVER_SESSION", "").strip()
-    session_path = os.getenv("TELEGRAM_RESOLVER_SESSION_PATH", "").strip()
 
-    if not api_id_raw or not api_hash:
-        raise TelegramResolverNotConfigured("Missing TELEGRAM_RESOLVER_API_ID/API_HASH")
+async def download_telegram_media_async(
+    tg_post_url: str,
+    *,
+    media_type: str,
+    caption: str,
+) -> str:
+    """Download Telegram media and return local file URI.
 
-    try:
-        api_id = int(api_id_raw)
-    except ValueError as exc:  # pragma: no cover - config error
-        raise TelegramResolverNotConfigured("TELEGRAM_RESOLVER_API_ID must be int") from exc
+    Requires TELEGRAM_RESOLVER_API_ID, TELEGRAM_RESOLVER_API_HASH and either
+    TELEGRAM_RESOLVER_SESSION (string session) or TELEGRAM_RESOLVER_SESSION_PATH.
+    Safe to await from any event loop; the work runs on the resolver loop that
+    owns the shared client.
+    """
 
+    config = _resolver_config()
     chat, message_id = _parse_telegram_url(tg_post_url)
     if not chat or not message_id:
         logger.info("Niepoprawny tg_post_url: %s", tg_post_url)
@@ -73,43 +244,12 @@ def download_telegram_media(
     media_type = (media_type or "").strip().lower()
 
     async def _run() -> Optional[str]:
-        client = _build_client(api_id, api_hash, session_string, session_path)
-        if client is None:
-            raise TelegramResolverNotConfigured("Unable to initialize Telegram client")
+        client = None
         try:
-            await client.connect()
-            if not await client.is_user_authorized():
-                raise TelegramResolverNotConfigured(
-                    "Telegram resolver session is not authorized; provide TELEGRAM_RESOLVER_SESSION",
-                )
-            entity = await client.get_entity(chat)
-            message = await client.get_messages(entity, ids=message_id)
-            if not message or not message.media:
-                raise TelegramMediaNotFound(f"No media in Telegram message {chat}/{message_id}")
-            dest_dir = Path(settings.MEDIA_ROOT) / "resolved" / "telegram"
-            dest_dir.mkdir(parents=True, exist_ok=True)
-
-            grouped_id = getattr(message, "grouped_id", None)
-            cache_key = (chat, grouped_id or message_id)
-            lookup_key = _album_lookup_key(chat, message_id)
-
-            cached_uri = _take_cached_album_entry(cache_key, media_type)
-            if cached_uri:
-                return cached_uri
-
-            album_entries = await _download_album_entries(client, entity, message, dest_dir)
-            if not album_entries:
-                raise TelegramMediaNotFound(f"Unable to download media for {chat}/{message_id}")
-
-            selected_uri = _select_album_entry(album_entries, media_type)
-            if not selected_uri:
-                raise TelegramMediaNotFound(f"Unable to download media for {chat}/{message_id}")
-
-            if album_entries:
-                _store_album_entries(cache_key, lookup_key, album_entries)
-            else:
-                _clear_album_entries(cache_key, lookup_key)
-            return selected_uri
+            client = await _shared_client(config)
+            entity = await _cached_entity(client, chat)
+            message = await _rpc(client.get_messages, entity, ids=message_id)
+            return await _resolve_message(client, entity, chat, message_id, message, media_type)
         except TelegramResolverNotConfigured:
             raise
         except TelegramMediaNotFound:
@@ -117,64 +257,287 @@ def download_telegram_media(
         except RPCError as exc:  # pragma: no cover - network/api issues
             logger.warning("Telegram RPC error: %s", exc)
             return None
-        except Exception:  # pragma: no cover - unexpected
+        except Exception as exc:  # pragma: no cover - unexpected
             logger.exception("Telegram resolver unexpected error for %s", tg_post_url)
+            # Other downloads share the client, so it is only dropped when the
+            # connection itself is gone, not for e.g. a failed disk write.
+            if isinstance(exc, ConnectionError) or (client is not None and not client.is_connected()):
+                await _drop_shared_client()
             return None
-        finally:
+
+    result = await _on_resolver_loop(_run())
+    return result or ""
+
+
+async def download_telegram_media_many_async(
+    tg_post_urls: List[str],
+    *,
+    media_type: str = "",
+) -> List[str]:
+    """Download media for many Telegram links at once; returns URIs in input order.
+
+    Messages are fetched with one ``get_messages`` call per chat and the
+    downloads overlap. Links that cannot be resolved yield an empty string.
+    """
+
+    config = _resolver_config()
+    parsed = [_parse_telegram_url(url) for url in tg_post_urls]
+    media_type = (media_type or "").strip().lower()
+
+    async def _run() -> List[str]:
+        client = await _shared_client(config)
+        ids_by_chat: Dict[str, List[int]] = {}
+        for chat, message_id in parsed:
+            if chat and message_id:
+                ids_by_chat.setdefault(chat, []).append(message_id)
+
+        messages: Dict[Tuple[str, int], Tuple[Any, Any]] = {}
+        for chat, ids in ids_by_chat.items():
             try:
-                await client.disconnect()
-            except Exception:
-                pass
+                entity = await _cached_entity(client, chat)
+                fetched = await _rpc(client.get_messages, entity, ids=list(dict.fromkeys(ids)))
+            except RPCError as exc:  # pragma: no cover - network/api issues
+                logger.warning("Telegram RPC error dla %s: %s", chat, exc)
+                continue
+            for message in fetched:
+                if message is not None:
+                    messages[(chat, message.id)] = (entity, message)
+
+        async def _one(chat: Optional[str], message_id: Optional[int]) -> str:
+            hit = messages.get((chat, message_id)) if chat and message_id else None
+            if hit is None:
+                return ""
+            entity, message = hit
+            return await _resolve_message(client, entity, chat, message_id, message, media_type) or ""
+
+        results = await asyncio.gather(*(_one(chat, mid) for chat, mid in parsed), return_exceptions=True)
+        uris: List[str] = []
+        for url, result in zip(tg_post_urls, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, TelegramMediaNotFound):
+                    logger.warning("Nie udało się pobrać mediów z %s: %s", url, result)
+                uris.append("")
+            else:
+                uris.append(result)
+        return uris
 
+    return await _on_resolver_loop(_run())
+
+
+def download_telegram_media_many(tg_post_urls: List[str], *, media_type: str = "") -> List[str]:
+    """Blocking wrapper around :func:`download_telegram_media_many_async`."""
+
+    return _wait_on_resolver_loop(
+        download_telegram_media_many_async(tg_post_urls, media_type=media_type),
+        default=[""] * len(tg_post_urls),
+        label=f"{len(tg_post_urls)} linków",
+    )
+
+
+def _wait_on_resolver_loop(coro, *, default, label: str):
+    """Block on ``coro`` run by the resolver loop, at most TELEGRAM_RESOLVER_TIMEOUT seconds."""
+
+    timeout = float(os.getenv("TELEGRAM_RESOLVER_TIMEOUT", "300") or 300)
+    future = asyncio.run_coroutine_threadsafe(coro, _resolver_loop())
     try:
-        result = asyncio.run(_run())
-        return result or ""
-    except TelegramResolverNotConfigured:
-        raise
-    except TelegramMediaNotFound:
-        raise
-    except RuntimeError as exc:  # pragma: no cover - nested loop
-        if "asyncio.run() cannot" in str(exc):
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        # Cancelling releases the loop for the next caller; the download is abandoned.
+        future.cancel()
+        logger.warning("Przekroczono limit %ss pobierania z Telegrama: %s", timeout, label)
+        return default
+
+
+@lru_cache(maxsize=1)
+def _resolver_config() -> _ResolverConfig:
+    """Read and validate resolver settings once per process."""
+
+    if TelegramClient is None:
+        raise TelegramResolverNotConfigured("telethon not installed")
+
+    api_id_raw = os.getenv("TELEGRAM_RESOLVER_API_ID", "").strip()
+    api_hash = os.getenv("TELEGRAM_RESOLVER_API_HASH", "").strip()
+
+    if not api_id_raw or not api_hash:
+        raise TelegramResolverNotConfigured("Missing TELEGRAM_RESOLVER_API_ID/API_HASH")
+
+    try:
+        api_id = int(api_id_raw)
+    except ValueError as exc:  # pragma: no cover - config error
+        raise TelegramResolverNotConfigured("TELEGRAM_RESOLVER_API_ID must be int") from exc
+    return _ResolverConfig(
+        api_id=api_id,
+        api_hash=api_hash,
+        session_string=os.getenv("TELEGRAM_RESOLVER_SESSION", "").strip(),
+        session_path=os.getenv("TELEGRAM_RESOLVER_SESSION_PATH", "").strip(),
+        session_dir=os.getenv("TELEGRAM_RESOLVER_SESSION_DIR", str(settings.BASE_DIR / "var")),
+        session_name=os.getenv("TELEGRAM_RESOLVER_SESSION_NAME", "tg_resolver"),
+    )
+
+
+async def _on_resolver_loop(coro):
+    """Await ``coro`` on the resolver loop, bridging from another loop if needed."""
+
+    loop = _resolver_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def _resolve_message(client, entity, chat: str, message_id: int, message, media_type: str) -> str:
+    """Return the URI of the part of ``message``'s album matching ``media_type``."""
+
+    if not message or not message.media:
+        raise TelegramMediaNotFound(f"No media in Telegram message {chat}/{message_id}")
+    dest_dir = _resolved_media_dir()
+
+    grouped_id = getattr(message, "grouped_id", None)
+    cache_key = (chat, grouped_id or message_id)
+    lookup_key = _album_lookup_key(chat, message_id)
+
+    while True:
+        cached_uri = _take_cached_album_entry(cache_key, media_type)
+        if cached_uri:
+            return cached_uri
+        pending = _INFLIGHT.get(cache_key)
+        if pending is None:
+            break
+        # Someone is already downloading this album; reuse their parts.
+        await pending
+
+    done = asyncio.get_running_loop().create_future()
+    _INFLIGHT[cache_key] = done
+    try:
+        album_entries = await _download_album_entries(client, entity, message, dest_dir)
+        if not album_entries:
+            raise TelegramMediaNotFound(f"Unable to download media for {chat}/{message_id}")
+
+        selected_uri = _select_album_entry(album_entries, media_type)
+        if not selected_uri:
+            raise TelegramMediaNotFound(f"Unable to download media for {chat}/{message_id}")
+
+        _store_album_entries(cache_key, lookup_key, album_entries)
+        return selected_uri
+    finally:
+        # Waiters only need the signal: on failure they retry the download themselves.
+        _INFLIGHT.pop(cache_key, None)
+        done.set_result(None)
+
+
+def _ensure_dir(path: Path) -> Path:
+    """Create ``path`` only the first time this process sees it."""
+
+    if path not in _READY_DIRS:
+        path.mkdir(parents=True, exist_ok=True)
+        _READY_DIRS.add(path)
+    return path
+
+
+def _resolved_media_dir() -> Path:
+    return _resolved_media_dir_for(str(settings.MEDIA_ROOT))
+
+
+@lru_cache(maxsize=8)
+def _resolved_media_dir_for(media_root: str) -> Path:
+    # Keyed by MEDIA_ROOT rather than computed at import so override_settings still applies.
+    return _ensure_dir(Path(media_root).absolute() / "resolved" / "telegram")
+
+
+def _resolver_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop that owns the shared Telegram client."""
+
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
             loop = asyncio.new_event_loop()
-            try:
-                asyncio.set_event_loop(loop)
-                result = loop.run_until_complete(_run())
-                return result or ""
-            finally:
-                loop.close()
-        raise
+            threading.Thread(target=loop.run_forever, name="telegram-resolver", daemon=True).start()
+            _LOOP = loop
+        return _LOOP
+
+
+async def _shared_client(config: _ResolverConfig):
+    """Return the connected, authorized client, connecting it on first use."""
+
+    global _CLIENT, _CLIENT_KEY, _CLIENT_LOCK
+    if _CLIENT_LOCK is None:
+        _CLIENT_LOCK = asyncio.Lock()
+    async with _CLIENT_LOCK:
+        if _CLIENT is not None and (_CLIENT_KEY != config or not _CLIENT.is_connected()):
+            await _drop_shared_client()
+        if _CLIENT is None:
+            client = _build_client(config)
+            if client is None:
+                raise TelegramResolverNotConfigured("Unable to initialize Telegram client")
+            await client.connect()
+            _CLIENT, _CLIENT_KEY = client, config
+        if not await _CLIENT.is_user_authorized():
+            await _drop_shared_client()
+            raise TelegramResolverNotConfigured(
+                "Telegram resolver session is not authorized; provide TELEGRAM_RESOLVER_SESSION",
+            )
+        return _CLIENT
+
+
+async def _drop_shared_client() -> None:
+    global _CLIENT, _CLIENT_KEY
+    client, _CLIENT, _CLIENT_KEY = _CLIENT, None, None
+    _ENTITY_CACHE.clear()
+    if client is None:
+        return
+    try:
+        await asyncio.wait_for(client.disconnect(), timeout=_DISCONNECT_TIMEOUT)
+    except Exception as exc:
+        # A failed disconnect can leave the sender tasks and socket behind; keep it visible.
+        logger.warning("Nie udało się rozłączyć klienta Telegram: %r", exc)
 
 
-def _build_client(api_id: int, api_hash: str, session_string: str, session_path: str):
-    if session_string:
-        return TelegramClient(StringSession(session_string), api_id, api_hash)
-    session_name = os.getenv("TELEGRAM_RESOLVER_SESSION_NAME", "tg_resolver")
-    if not session_path:
-        session_dir = Path(os.getenv("TELEGRAM_RESOLVER_SESSION_DIR", settings.BASE_DIR / "var"))
-        session_dir.mkdir(parents=True, exist_ok=True)
-        session_file = session_dir / session_name
+async def _cached_entity(client, chat: str):
+    """Return the peer for ``chat``, resolving it at most once per TTL."""
+
+    now = time.monotonic()
+    hit = _ENTITY_CACHE.get(chat)
+    if hit is not None and now - hit[0] < _ENTITY_CACHE_TTL:
+        _ENTITY_CACHE.move_to_end(chat)
+        return hit[1]
+    entity = await _rpc(client.get_entity, chat)
+    _ENTITY_CACHE[chat] = (now, entity)
+    _ENTITY_CACHE.move_to_end(chat)
+    while len(_ENTITY_CACHE) > _ENTITY_CACHE_LIMIT:
+        _ENTITY_CACHE.popitem(last=False)
+    return entity
+
+
+def _shutdown_shared_client() -> None:
+    """Disconnect the shared client cleanly when the process exits."""
+
+    loop = _LOOP
+    if _CLIENT is None or loop is None or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_drop_shared_client(), loop).result(timeout=5)
+    except Exception:  # pragma: no cover - best effort at interpreter exit
+        logger.debug("Nie udało się rozłączyć klienta Telegram przy zamykaniu procesu", exc_info=True)
+
+
+atexit.register(_shutdown_shared_client)
+
+
+def _build_client(config: _ResolverConfig):
+    if config.session_string:
+        return TelegramClient(StringSession(config.session_string), config.api_id, config.api_hash)
+    if not config.session_path:
+        session_file = _ensure_dir(Path(config.session_dir)) / config.session_name
     else:
-        session_file = Path(session_path)
-        session_file.parent.mkdir(parents=True, exist_ok=True)
-    return TelegramClient(session_file.as_posix(), api_id, api_hash)
+        session_file = Path(config.session_path)
+        _ensure_dir(session_file.parent)
+    return TelegramClient(session_file.as_posix(), config.api_id, config.api_hash)
 
 
 def _parse_telegram_url(url: str):
-    parsed = urlparse(url)
-    path = parsed.path or ""
-    path = path.strip("/")
-    if path.startswith("s/"):
-        path = path[2:]
-    parts = [segment for segment in path.split("/") if segment]
-    if len(parts) < 2:
+    match = _TG_URL_RE.match(url)
+    if match is None:
         return None, None
-    chat = parts[0]
-    try:
-        message_id = int(parts[1])
-    except ValueError:
-        # urls with message slug? ignore
-        return None, None
-    return chat, message_id
+    return match.group(1), int(match.group(2))
 
 
 async def _collect_album_messages(client, entity, message):
@@ -182,8 +545,11 @@ async def _collect_album_messages(client, entity, message):
     if not grouped_id:
         return [message]
 
-    ids = list(range(max(1, message.id - 16), message.id + 17))
-    fetched = await client.get_messages(entity, ids=ids)
+    # An album has at most _ALBUM_MAX_ITEMS consecutive messages, so every
+    # sibling lies within that distance of the linked one.
+    span = _ALBUM_MAX_ITEMS - 1
+    ids = list(range(max(1, message.id - span), message.id + span + 1))
+    fetched = await _rpc(client.get_messages, entity, ids=ids)
     album = [msg for msg in fetched if msg and getattr(msg, "media", None) and msg.grouped_id == grouped_id]
     if not album:
         return [message]
@@ -200,19 +566,62 @@ async def _collect_album_messages(client, entity, message):
 
 async def _download_album_entries(client, entity, message, dest_dir: Path) -> List[_AlbumEntry]:
     messages_to_download = await _collect_album_messages(client, entity, message)
-    entries: List[_AlbumEntry] = []
-    for item in messages_to_download:
-        if not getattr(item, "media", None):
-            continue
-        file_path = await client.download_media(item, file=dest_dir)
+
+    async def _download(item) -> Optional[_AlbumEntry]:
+        # Równoległość ogranicza wspólny limiter AIMD, który maleje po FLOOD_WAIT.
+        # Dokumenty przechodzą przez limiter osobno dla każdego zapytania GetFile,
+        # zdjęcia (zwykle jedno-dwa zapytania) jako jedno wywołanie.
+        if getattr(item, "document", None) is not None:
+            file_path = await _download_streaming(client, item, dest_dir)
+        else:
+            file_path = await _rpc(client.download_media, item, file=dest_dir)
         if not file_path:
+            return None
+        # absolute() only joins the cwd for relative paths; no realpath walk per file.
+        uri = Path(file_path).absolute().as_uri()
+        return {"uri": uri, "type": _infer_media_type(item)}
+
+    items = [item for item in messages_to_download if getattr(item, "media", None)]
+    # gather keeps album order, so entries still match message order.
+    results = await asyncio.gather(*(_download(item) for item in items), return_exceptions=True)
+    entries: List[_AlbumEntry] = []
+    for item, result in zip(items, results):
+        if isinstance(result, BaseException):
+            logger.warning("Nie udało się pobrać części albumu %s: %s", getattr(item, "id", "?"), result)
             continue
-        uri = Path(file_path).resolve().as_uri()
-        media_kind = _infer_media_type(item)
-        entries.append({"uri": uri, "type": media_kind})
+        if result:
+            entries.append(result)
     return entries
 
 
+async def _download_streaming(client, item, dest_dir: Path) -> Optional[str]:
+    """Stream a document (e.g. a video) to disk without blocking the event loop on writes."""
+
+    ext = getattr(getattr(item, "file", None), "ext", None) or ""
+    chat_id = getattr(item, "chat_id", None)
+    name = f"tg_{abs(chat_id)}_{item.id}{ext}" if chat_id else f"tg_{item.id}{ext}"
+    path = dest_dir / name
+    partial = path.with_name(f"{path.name}.part")
+    handle = await asyncio.to_thread(partial.open, "wb")
+    chunks = client.iter_download(item.media, request_size=_STREAM_REQUEST_SIZE)
+    try:
+        while True:
+            # Each chunk is one GetFile request, so the rate limit and the AIMD
+            # back-off apply per request rather than per file.
+            try:
+                chunk = await _rpc(chunks.__anext__)
+            except StopAsyncIteration:
+                break
+            await asyncio.to_thread(handle.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(handle.close)
+        partial.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(handle.close)
+    partial.replace(path)
+    return str(path)
+
+
 def _infer_media_type(message) -> str:
     if getattr(message, "photo", None):
         return "photo"
@@ -221,10 +630,7 @@ def _infer_media_type(message) -> str:
     document = getattr(message, "document", None)
     if document is not None:
         mime_type = getattr(document, "mime_type", "") or ""
-        if mime_type.startswith("image/"):
-            return "photo"
-        if mime_type.startswith("video/"):
-            return "video"
+        return _MIME_PREFIX_TYPES.get(mime_type[:6], "doc")
     return "doc"
 
 
@@ -248,53 +654,76 @@ def _album_lookup_key(chat: str, message_id: int) -> str:
     return f"{chat}/{message_id}"
 
 
-def _take_cached_album_entry(cache_key: Tuple[str, int], media_type: str) -> Optional[str]:
-    cached = _ALBUM_CACHE.get(cache_key)
-    if not cached:
+def _album_redis():
+    """Return the Redis client backing the album cache, or None to stay in-process."""
+
+    global _ALBUM_REDIS, _ALBUM_REDIS_URL, _ALBUM_REDIS_TAKE
+    url = os.getenv("REDIS_URL", "").strip()
+    if not url:
         return None
-    idx = -1
-    if media_type:
-        for pos, entry in enumerate(cached):
-            if entry["type"] == media_type:
-                idx = pos
-                break
-    if idx == -1:
-        idx = 0
-    entry = cached.pop(idx)
-    uri = entry.get("uri", "")
-    if not cached:
-        _ALBUM_CACHE.pop(cache_key, None)
-        lookup = _ALBUM_CACHE_LOOKUP.pop(cache_key, None)
-        if lookup:
-            _ALBUM_CACHE_KEYS.pop(lookup, None)
-    return uri or None
+    if _ALBUM_REDIS is None or _ALBUM_REDIS_URL != url:
+        _ALBUM_REDIS = redis.Redis.from_url(url, socket_timeout=2)
+        _ALBUM_REDIS_TAKE = _ALBUM_REDIS.register_script(_ALBUM_REDIS_TAKE_SCRIPT)
+        _ALBUM_REDIS_URL = url
+    return _ALBUM_REDIS
+
+
+def _album_redis_key(cache_key: Tuple[str, int]) -> str:
+    chat, grouped_id = cache_key
+    return f"{_ALBUM_REDIS_PREFIX}:{chat}:{grouped_id}"
+
+
+def _album_redis_lookup_key(lookup_key: str) -> str:
+    return f"{_ALBUM_REDIS_PREFIX}:lookup:{lookup_key}"
+
+
+def _take_cached_album_entry(cache_key: Tuple[str, int], media_type: str) -> Optional[str]:
+    client = _album_redis()
+    if client is not None:
+        try:
+            raw = _ALBUM_REDIS_TAKE(keys=[_album_redis_key(cache_key)], args=[media_type or ""])
+        except redis.RedisError as exc:
+            logger.warning("Cache albumów w Redisie niedostępny: %s", exc)
+        else:
+            if not raw:
+                return None
+            return json.loads(raw).get("uri") or None
+
+    with _ALBUM_CACHE_LOCK:
+        cached = _ALBUM_CACHE.get(cache_key)
+        if cached is None:
+            return None
+        uri = _select_album_entry(cached.entries, media_type)
+        if cached.entries:
+            _ALBUM_CACHE.move_to_end(cache_key)
+        else:
+            del _ALBUM_CACHE[cache_key]
+        return uri
 
 
 def _store_album_entries(cache_key: Tuple[str, int], lookup_key: str, entries: List[_AlbumEntry]) -> None:
-    if not entries:
-        _clear_album_entries(cache_key, lookup_key)
-        return
-    # ensure we replace any previous mapping for this cache key
-    _ALBUM_CACHE.pop(cache_key, None)
-    previous_lookup = _ALBUM_CACHE_LOOKUP.pop(cache_key, None)
-    if previous_lookup:
-        _ALBUM_CACHE_KEYS.pop(previous_lookup, None)
-    if len(_ALBUM_CACHE) >= _ALBUM_CACHE_LIMIT:
-        oldest = next(iter(_ALBUM_CACHE))
-        _ALBUM_CACHE.pop(oldest, None)
-        lookup = _ALBUM_CACHE_LOOKUP.pop(oldest, None)
-        if lookup:
-            _ALBUM_CACHE_KEYS.pop(lookup, None)
-    _ALBUM_CACHE[cache_key] = list(entries)
-    _ALBUM_CACHE_LOOKUP[cache_key] = lookup_key
-    _ALBUM_CACHE_KEYS[lookup_key] = cache_key
-
-
-def _clear_album_entries(cache_key: Tuple[str, int], lookup_key: str) -> None:
-    _ALBUM_CACHE.pop(cache_key, None)
-    _ALBUM_CACHE_LOOKUP.pop(cache_key, None)
-    if lookup_key:
-        _ALBUM_CACHE_KEYS.pop(lookup_key, None)
+    client = _album_redis()
+    if client is not None:
+        album_key = _album_redis_key(cache_key)
+        pipe = client.pipeline()
+        pipe.delete(album_key)
+        if entries:
+            pipe.rpush(album_key, *(json.dumps(entry) for entry in entries))
+            pipe.expire(album_key, _ALBUM_REDIS_TTL)
+            pipe.set(_album_redis_lookup_key(lookup_key), album_key, ex=_ALBUM_REDIS_TTL)
+        try:
+            pipe.execute()
+            return
+        except redis.RedisError as exc:
+            logger.warning("Cache albumów w Redisie niedostępny: %s", exc)
+
+    with _ALBUM_CACHE_LOCK:
+        _ALBUM_CACHE.pop(cache_key, None)
+        if not entries:
+            return
+        while len(_ALBUM_CACHE) >= _ALBUM_CACHE_LIMIT:
+            _ALBUM_CACHE.popitem(last=False)
+        _ALBUM_CACHE[cache_key] = _CachedAlbum(lookup_key, list(entries))
 
 
 def consume_cached_album(tg_post_url: str) -> List[Dict[str, str]]:
@@ -304,9 +733,30 @@ def consume_cached_album(tg_post_url: str) -> List[Dict[str, str]]:
     if not chat or not message_id:
         return []
     lookup_key = _album_lookup_key(chat, message_id)
-    cache_key = _ALBUM_CACHE_KEYS.pop(lookup_key, None)
-    if not cache_key:
+    client = _album_redis()
+    if client is not None:
+        try:
+            return _consume_redis_album(client, lookup_key)
+        except redis.RedisError as exc:
+            logger.warning("Cache albumów w Redisie niedostępny: %s", exc)
+    with _ALBUM_CACHE_LOCK:
+        cache_key = next(
+            (key for key, cached in _ALBUM_CACHE.items() if cached.lookup_key == lookup_key),
+            None,
+        )
+        if cache_key is None:
+            return []
+        cached = _ALBUM_CACHE.pop(cache_key)
+    return [dict(entry) for entry in cached.entries]
+
+
+def _consume_redis_album(client, lookup_key: str) -> List[Dict[str, str]]:
+    redis_lookup_key = _album_redis_lookup_key(lookup_key)
+    album_key = client.get(redis_lookup_key)
+    if not album_key:
         return []
-    cached = _ALBUM_CACHE.pop(cache_key, [])
-    _ALBUM_CACHE_LOOKUP.pop(cache_key, None)
-    return [dict(entry) for entry in cached]
+    pipe = client.pipeline()
+    pipe.lrange(album_key, 0, -1)
+    pipe.delete(album_key, redis_lookup_key)
+    raw_entries, _ = pipe.execute()
+    return [json.loads(raw) for raw in raw_entries]
@@ -1,20 +1,25 @@
-import base64
+import binascii
 import hashlib
+import heapq
 import json
 import logging
+import math
 import mimetypes
 import os
 import random
+import shutil
 import time
 import textwrap
+import threading
 import uuid
 from html import unescape
-from html.parser import HTMLParser
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from pathlib import Path
 from urllib.parse import urlparse, urlunparse, unquote
 import re
 
 import httpx
+import orjson
 from openai import (
     OpenAI,
     RateLimitError,
@@ -29,37 +34,73 @@ from django.utils import timezone
 from django.utils.formats import date_format
 from django.conf import settings
 from telegram import Bot
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process as rf_process
 from .models import Channel, ChannelSource, Post, PostMedia
 from dateutil import tz
 from typing import Any, Dict, List, Optional, Iterable
 from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from django.db.models import Q
 
 logger = logging.getLogger(__name__)
 
 
-class _MetaTagParser(HTMLParser):
-    def __init__(self) -> None:
-        super().__init__()
-        self.meta: dict[str, list[str]] = {}
+_META_TAG_RE = re.compile(r"<meta\b[^>]*>", re.IGNORECASE)
+_META_ATTR_RE = re.compile(
+    r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.IGNORECASE
+)
+_HEAD_END_RE = re.compile(r"</head\s*>", re.IGNORECASE)
+
+
+def _extract_meta_tags(html: str, keys: Iterable[str]) -> dict[str, list[str]]:
+    """Zbiera wartości content wybranych tagów <meta> (property/name) z nagłówka."""
 
-    def handle_starttag(self, tag: str, attrs: list[tuple[str | None, str | None]]) -> None:
-        if tag.lower() != "meta":
-            return
+    wanted = {key.lower() for key in keys}
+    if not wanted:
+        return {}
+    head_end = _HEAD_END_RE.search(html)
+    if head_end:
+        html = html[: head_end.start()]
+    meta: dict[str, list[str]] = {}
+    for tag in _META_TAG_RE.finditer(html):
         attr_map: dict[str, str] = {}
-        for key, value in attrs:
-            if not key or value is None:
-                continue
-            attr_map[key.lower()] = value
-        name = attr_map.get("property") or attr_map.get("name")
-        content = attr_map.get("content")
-        if not name or content is None:
-            return
-        bucket = self.meta.setdefault(name.lower(), [])
-        bucket.append(content)
+        for key, double, single, bare in _META_ATTR_RE.findall(tag.group(0)):
+            attr_map.setdefault(key.lower(), double or single or bare)
+        name = (attr_map.get("property") or attr_map.get("name") or "").lower()
+        if name in wanted and "content" in attr_map:
+            meta.setdefault(name, []).append(attr_map["content"])
+    return meta
+
+
+_HTTP_CLIENT: httpx.Client | None = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+
+def _http_client() -> httpx.Client:
+    """Wspólny klient HTTP dla resolvera mediów, fallbacków HTML i pobierania mediów.
+
+    Utrzymuje połączenia keep-alive, więc kolejne zapytania do tych samych hostów
+    (MEDIA_RESOLVER_URL, x.com, twstalker, r.jina.ai, *.twimg.com) pomijają uzgadnianie
+    TCP/TLS. Tworzony leniwie pod blokadą (wątki resolvera mogą wołać go jednocześnie),
+    żeby procesy forkowane po imporcie nie dzieliły gniazd. Ciasteczka są odrzucane,
+    żeby odpowiedź jednego hosta nie zmieniała kolejnych zapytań całego procesu.
+    """
+
+    global _HTTP_CLIENT
+    client = _HTTP_CLIENT
+    if client is None:
+        with _HTTP_CLIENT_LOCK:
+            if _HTTP_CLIENT is None:
+                _HTTP_CLIENT = httpx.Client(
+                    limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+                    cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                )
+            client = _HTTP_CLIENT
+    return client
 
 
+@lru_cache(maxsize=4096)
 def _looks_like_asset(url: str) -> bool:
     parsed = urlparse(url)
     if not parsed.scheme or not parsed.scheme.startswith("http"):
@@ -211,16 +252,7 @@ def _canonical_tweet_url(username: str, tweet_id: str) -> str:
     return f"https://x.com/i/status/{tweet_id}"
 
 
-def _extract_twitter_media_from_html(html: str, media_type: str) -> str:
-    parser = _MetaTagParser()
-    try:
-        parser.feed(html)
-    except Exception:
-        logger.exception(
-            "Nie udało się przeanalizować dokumentu HTML podczas wyszukiwania mediów Twittera"
-        )
-        parser.meta = {}
-
+def _twitter_meta_keys(media_type: str) -> list[str]:
     preferred_keys: list[str] = []
     if media_type == "video":
         preferred_keys.extend(
@@ -234,11 +266,22 @@ def _extract_twitter_media_from_html(html: str, media_type: str) -> str:
 
     if media_type in {"photo", "video"}:
         preferred_keys.extend(["og:image", "og:image:url", "og:image:secure_url"])
+    return preferred_keys
+
 
-    direct_url = _extract_meta_first(getattr(parser, "meta", {}), preferred_keys)
+def _extract_twitter_meta_media(html: str, media_type: str) -> str:
+    preferred_keys = _twitter_meta_keys(media_type)
+    direct_url = _extract_meta_first(_extract_meta_tags(html, preferred_keys), preferred_keys)
     if direct_url and _looks_like_asset(direct_url):
         return direct_url
+    return ""
+
 
+def _extract_twimg_media(html: str, media_type: str) -> str:
+    # Każdy kandydat zawiera host *.twimg.com (w dowolnej wielkości liter), więc strona bez
+    # tego ciągu nie wymaga pełnego skanowania wyrażeniem regularnym.
+    if not _TWIMG_HOST_RE.search(html):
+        return ""
     candidates = _extract_twimg_candidates(html)
     if not candidates:
         return ""
@@ -246,6 +289,10 @@ def _extract_twitter_media_from_html(html: str, media_type: str) -> str:
     return selected
 
 
+def _extract_twitter_media_from_html(html: str, media_type: str) -> str:
+    return _extract_twitter_meta_media(html, media_type) or _extract_twimg_media(html, media_type)
+
+
 def _resolve_media_via_twitter_html(url: str, media_type: str) -> str:
     timeout_s = float(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", 30))
     headers = {
@@ -255,9 +302,25 @@ def _resolve_media_via_twitter_html(url: str, media_type: str) -> str:
             "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
         )
     }
+    chunks: list[str] = []
+    head_checked = False
     try:
-        response = httpx.get(url, timeout=timeout_s, follow_redirects=True, headers=headers)
-        response.raise_for_status()
+        with _http_client().stream(
+            "GET", url, timeout=timeout_s, follow_redirects=True, headers=headers
+        ) as response:
+            response.raise_for_status()
+            for chunk in response.iter_text():
+                chunks.append(chunk)
+                if head_checked:
+                    continue
+                # Tagi og: są w <head>; jeśli dają gotowy plik, reszty strony nie pobieramy.
+                # Końcówka poprzedniego fragmentu łapie </head> rozcięty między fragmentami.
+                tail = chunks[-2][-16:] if len(chunks) > 1 else ""
+                if _HEAD_END_RE.search(tail + chunk):
+                    head_checked = True
+                    direct_url = _extract_twitter_meta_media("".join(chunks), media_type)
+                    if direct_url:
+                        return direct_url
     except httpx.HTTPStatusError as exc:
         logger.warning(
             "Twitter HTML fallback zwrócił HTTP %s dla %s", exc.response.status_code, url
@@ -267,68 +330,69 @@ def _resolve_media_via_twitter_html(url: str, media_type: str) -> str:
         logger.warning("Twitter HTML fallback błąd sieci dla %s: %s", url, exc)
         return ""
 
-    return _extract_twitter_media_from_html(response.text, media_type)
+    html = "".join(chunks)
+    if head_checked:
+        return _extract_twimg_media(html, media_type)
+    return _extract_twitter_media_from_html(html, media_type)
+
+
+_TWIMG_RE = re.compile(r"https://[\w.-]*twimg\.com/[^\s\"'<>]+", re.IGNORECASE)
+_TWIMG_HOST_RE = re.compile(r"twimg\.com", re.IGNORECASE)
+_NAME_PARAM_RE = re.compile(r"[?&]name=([^&#]+)")
+_RESOLUTION_RE = re.compile(r"/(\d+)x(\d+)/")
+# Alternatywy sprawdzane jednym wyszukiwaniem na adres zapisany małymi literami.
+_PHOTO_SKIP_RE = re.compile(r"profile_images|semantic_core_img")
+_PHOTO_TAG_RE = re.compile(r"/media/|ext_tw_video_thumb|tweet_video_thumb")
+_VIDEO_TAG_RE = re.compile(r"/ext_tw_video/|tweet_video|amplify_video")
+_PHOTO_NAME_ORDER = {"orig": 5, "large": 4, "medium": 3, "small": 2, "thumb": 1}
 
 
 def _extract_twimg_candidates(text: str) -> list[str]:
-    pattern = re.compile(r"https://[\w.-]*twimg\.com/[^\s\"'<>]+", re.IGNORECASE)
-    candidates: list[str] = []
-    for match in pattern.findall(text):
-        url = unescape(match)
-        if url in candidates:
-            continue
-        candidates.append(url)
-    return candidates
+    # dict zachowuje kolejność wystąpień, a sprawdzenie duplikatu jest O(1).
+    return list(dict.fromkeys(unescape(match) for match in _TWIMG_RE.findall(text)))
 
 
 def _prefer_photo_url(urls: list[str]) -> str:
-    filtered: list[str] = []
+    # Jedno przejście: adresy z tagami mediów mają pierwszeństwo, pozostałe z pbs.twimg.com
+    # są używane tylko wtedy, gdy takich brak.
+    tagged: list[str] = []
+    hosted: list[str] = []
     for url in urls:
         lowered = url.lower()
-        if any(skip in lowered for skip in ("profile_images", "semantic_core_img")):
+        if _PHOTO_SKIP_RE.search(lowered):
             continue
-        if any(tag in lowered for tag in ("/media/", "ext_tw_video_thumb", "tweet_video_thumb")):
-            filtered.append(url)
-    if not filtered:
-        for url in urls:
-            lowered = url.lower()
-            if any(skip in lowered for skip in ("profile_images", "semantic_core_img")):
-                continue
-            if "pbs.twimg.com" in lowered:
-                filtered.append(url)
+        if _PHOTO_TAG_RE.search(lowered):
+            tagged.append(url)
+        elif "pbs.twimg.com" in lowered:
+            hosted.append(url)
+    filtered = tagged or hosted
     if not filtered:
         return ""
 
-    def _score(name: str) -> int:
-        order = {"orig": 5, "large": 4, "medium": 3, "small": 2, "thumb": 1}
-        return order.get(name.lower(), 0)
+    def _score(item: str) -> tuple[int, int]:
+        match = _NAME_PARAM_RE.search(item)
+        name = match.group(1).lower() if match else ""
+        return _PHOTO_NAME_ORDER.get(name, 0), len(item)
 
-    best_url = max(
-        filtered,
-        key=lambda item: (
-            _score(re.search(r"[?&]name=([^&#]+)", item).group(1) if re.search(r"[?&]name=([^&#]+)", item) else ""),
-            len(item),
-        ),
-    )
-    return best_url
+    return max(filtered, key=_score)
 
 
 def _prefer_video_url(urls: list[str]) -> str:
-    filtered: list[str] = []
+    videos: list[str] = []
+    thumbs: list[str] = []
     for url in urls:
         lowered = url.lower()
-        if any(tag in lowered for tag in ("/ext_tw_video/", "tweet_video", "amplify_video")) and "thumb" not in lowered:
-            filtered.append(url)
-    if not filtered:
-        for url in urls:
-            lowered = url.lower()
-            if "ext_tw_video_thumb" in lowered:
-                filtered.append(url)
+        if "thumb" not in lowered:
+            if _VIDEO_TAG_RE.search(lowered):
+                videos.append(url)
+        elif "ext_tw_video_thumb" in lowered:
+            thumbs.append(url)
+    filtered = videos or thumbs
     if not filtered:
         return ""
 
     def _resolution_score(item: str) -> int:
-        match = re.search(r"/(\d+)x(\d+)/", item)
+        match = _RESOLUTION_RE.search(item)
         if match:
             return int(match.group(1)) * int(match.group(2))
         return len(item)
@@ -352,7 +416,7 @@ def _resolve_media_via_twstalker(
     }
     url = f"https://www.twstalker.com/{username}/status/{tweet_id}"
     try:
-        response = httpx.get(url, timeout=timeout_s, headers=headers)
+        response = _http_client().get(url, timeout=timeout_s, headers=headers)
         response.raise_for_status()
     except httpx.HTTPStatusError as exc:
         logger.warning(
@@ -385,7 +449,7 @@ def _resolve_media_via_jina_proxy(url: str, media_type: str, resolver: str) -> s
     }
     proxied_url = f"https://r.jina.ai/{url}"
     try:
-        response = httpx.get(proxied_url, timeout=timeout_s, headers=headers)
+        response = _http_client().get(proxied_url, timeout=timeout_s, headers=headers)
         response.raise_for_status()
     except httpx.HTTPStatusError as exc:
         logger.warning(
@@ -465,11 +529,17 @@ def _serialisable_payload(value: Any) -> Any:
 
 
 def _log_openai_request(kind: str, payload: dict[str, Any], *, context: dict[str, Any] | None = None) -> None:
+    # Bez skonfigurowanego poziomu INFO nie kopiujemy ani nie serializujemy payloadu.
+    if not logger.isEnabledFor(logging.INFO):
+        return
     entry: dict[str, Any] = {"kind": kind, "payload": _serialisable_payload(payload)}
     if context:
         entry["context"] = _serialisable_payload(context)
     try:
-        logger.info("GPT request payload: %s", json.dumps(entry, ensure_ascii=False))
+        logger.info(
+            "GPT request payload: %s",
+            orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS).decode(),
+        )
     except Exception:
         logger.exception("Nie udało się zserializować payloadu GPT: %s", entry)
 
@@ -484,6 +554,7 @@ _oai: OpenAI | None = None
 _OPENAI_SEED: Optional[int] = None
 
 _SUPPORTED_MEDIA_TYPES = {"photo", "video", "doc"}
+_MEDIA_RESOLVE_WORKERS = 5
 _IDENTIFIER_KEYS = (
     "tweet_id",
     "tweet_url",
@@ -524,6 +595,20 @@ _IDENTIFIER_KEY_ALIASES = {
     "source locator": "source_locator",
 }
 
+# Klucze przeszukiwane przy wyciąganiu adresu mediów z odpowiedzi resolvera i z reference.
+_URL_KEYS = ("source_url", "download_url", "url", "image_url", "href")
+_NESTED_URL_KEYS = ("source", "asset", "file", "image", "media", "items", "data", "results", "variants")
+_REFERENCE_FALLBACK_URL_KEYS = (
+    "media_url",
+    "direct_url",
+    "download_url",
+    "source_url",
+    "tg_post_url",
+    "source_locator",
+    "tweet_url",
+    "permalink",
+    "url",
+)
 _REQUIRED_OPENAI_TOOL = "web_search"
 
 
@@ -669,27 +754,46 @@ def _openai_seed() -> Optional[int]:
     return _OPENAI_SEED
 
 def _channel_constraints_prompt(channel: Channel) -> str:
+    rules = list(
+        _channel_static_rules(
+            channel.language or "",
+            getattr(channel, "max_chars", None),
+            channel.footer_text or "",
+            bool(getattr(channel, "no_links_in_text", False)),
+        )
+    )
+
+    # Źródło jest losowane przy każdym wywołaniu, dlatego nie trafia do cache.
+    sources_prompt = _channel_sources_prompt(channel).strip()
+    if sources_prompt:
+        rules.append(sources_prompt)
+
+    return "\n".join(rule for rule in rules if rule)
+
+
+@lru_cache(maxsize=256)
+def _channel_static_rules(
+    language: str, max_chars: int | None, footer_text: str, no_links_in_text: bool
+) -> tuple[str, ...]:
+    """Stałe wytyczne kanału; klucz to wartości pól, więc edycja kanału tworzy nowy wpis."""
+
     rules: list[str] = []
-    language = (channel.language or "").strip()
+    language = language.strip()
     if language:
         rules.append(f"Piszesz w języku: {language}.")
 
-    if getattr(channel, "max_chars", None):
-        rules.append(f"Limit długości tekstu: maksymalnie {channel.max_chars} znaków.")
+    if max_chars:
+        rules.append(f"Limit długości tekstu: maksymalnie {max_chars} znaków.")
 
-    footer = (channel.footer_text or "").strip()
+    footer = footer_text.strip()
     if footer:
         rules.append("Stopka kanału:")
         rules.append(footer)
 
-    if getattr(channel, "no_links_in_text", False):
+    if no_links_in_text:
         rules.append("Nie dodawaj linków w treści.")
-        
-    sources_prompt = _channel_sources_prompt(channel).strip()
-    if sources_prompt:
-        rules.append(sources_prompt)
 
-    return "\n".join(rule for rule in rules if rule)
+    return tuple(rules)
 
 
 def _channel_system_prompt(channel: Channel) -> str:
@@ -720,22 +824,17 @@ def _select_channel_sources(
     if not sources or limit <= 0:
         return []
 
-    pool = list(sources)
-    weights = [max(int(getattr(item, "priority", 1) or 0), 0) for item in pool]
     rng = rng or random
-    selected: list[ChannelSource] = []
-    total = min(limit, len(pool))
-    for _ in range(total):
-        if not pool:
-            break
-        if not any(weights):
-            weights = [1 for _ in pool]
-        choice = rng.choices(pool, weights=weights, k=1)[0]
-        idx = pool.index(choice)
-        selected.append(choice)
-        pool.pop(idx)
-        weights.pop(idx)
-    return selected
+    # Losowanie ważone bez zwracania (Efraimidis–Spirakis): każde źródło dostaje klucz
+    # log(u)/waga i wybieramy `limit` największych. Źródła z wagą 0 trafiają na koniec
+    # w losowej kolejności, tak jak wcześniej – dopiero gdy zabraknie pozostałych.
+    keyed = []
+    for source in sources:
+        weight = max(int(getattr(source, "priority", 1) or 0), 0)
+        key = math.log(1.0 - rng.random()) / weight if weight else -math.inf
+        keyed.append((key, rng.random(), source))
+    top = heapq.nlargest(limit, keyed, key=lambda item: item[:2])
+    return [source for _, _, source in top]
 
 
 def _channel_sources_prompt(channel: Channel) -> str:
@@ -843,7 +942,10 @@ def _recent_post_texts(channel: Channel, *, limit: int = 40) -> list[str]:
         .order_by("-id")
         .values_list("text", flat=True)[:limit]
     )
-    return [" ".join((text or "").split()) for text in queryset if text]
+    # Teksty są normalizowane tylko tutaj; _score_similar_texts porównuje je bez
+    # ponownego przetwarzania.
+    collapsed = (" ".join(text.split()) for text in queryset if text)
+    return [text for text in collapsed if text]
 
 
 def _extract_post_headline(text: str, *, max_length: int = 150) -> str:
@@ -897,24 +999,17 @@ def _recent_post_headlines(
     return headlines
 
 
-def _score_similar_texts(candidate: str, existing:
-                         
-                         
-                         
-                         
-                         
-                         [str]) -> list[tuple[float, str]]:
+def _score_similar_texts(candidate: str, existing: list[str]) -> list[tuple[float, str]]:
     candidate_clean = " ".join((candidate or "").split())
     if not candidate_clean:
         return []
-    scored: list[tuple[float, str]] = []
-    for original in existing:
-        if not original:
-            continue
-        score = fuzz.token_set_ratio(candidate_clean, original) / 100.0
-        scored.append((score, original))
-    scored.sort(key=lambda item: item[0], reverse=True)
-    return scored
+    choices = [original for original in existing if original]
+    # process.extract ocenia wszystkie teksty w C++ i sortuje malejąco, zachowując
+    # kolejność przy równych wynikach. Teksty są już znormalizowane, więc bez processora.
+    matches = rf_process.extract(
+        candidate_clean, choices, scorer=fuzz.token_set_ratio, processor=None, limit=None
+    )
+    return [(score / 100.0, original) for original, score, _ in matches]
 
 
 def _merge_avoid_texts(existing: list[str], new_items: Iterable[str], *, limit: int = 5) -> list[str]:
@@ -1022,6 +1117,31 @@ def _merge_topics_to_avoid(*sources: Iterable[str]) -> list[str]:
     return merged
 
 
+# Stała część instrukcji promptu draftu; per wywołanie dokładamy tylko dane artykułu i tematy.
+_DRAFT_PROMPT_INSTRUCTIONS: tuple[str, ...] = (
+    "Zwróć dokładnie jeden obiekt JSON zawierający pola:",
+    "- post: obiekt z polem text zawierającym gotową treść posta zgodną z zasadami kanału;",
+    "- source: zródła na których oparłeś artykuł, powienien tu być dokładny link wpisu/artykułu;",
+    "- media: lista 0-5 obiektów opisujących multimedia do posta.",
+    (
+        "Każdy obiekt media powinien zawierać resolver "
+        "(np. twitter/telegram/instagram/rss) oraz reference – obiekt z prawdziwymi"
+        " identyfikatorami źródła (np. {\"tg_post_url\": \"https://t.me/...\","
+        " \"posted_at\": \"2024-06-09T10:32:00Z\"})."
+        "Jeśli jest to strona www, podaj url media zdjęcie/video z artykułu"
+    ),
+    "Pole reference.source_locator musi zawierać dokładny link lub identyfikator wpisu źródłowego.",
+
+    "Używaj wyłącznie angielskich nazw pól w formacie snake_case (ASCII, bez spacji i znaków diakrytycznych).",
+    (
+        "Jeśli media pochodzą z artykułu lub innego źródła, dołącz dostępne metadane"
+        " (caption (max 20znaków), posted_at, author)."
+    ),
+    "Pole has_spoiler (true/false) jest opcjonalne i dotyczy wyłącznie zdjęć wymagających ukrycia.",
+    "Treść posta oraz wszystkie media muszą opisywać to samo wydarzenie.",
+)
+
+
 def _build_user_prompt(
     channel: Channel,
     article: dict[str, Any] | None,
@@ -1029,28 +1149,7 @@ def _build_user_prompt(
     *,
     recent_headlines: Iterable[str] | None = None,
 ) -> str:
-    instructions = [
-        "Zwróć dokładnie jeden obiekt JSON zawierający pola:",
-        "- post: obiekt z polem text zawierającym gotową treść posta zgodną z zasadami kanału;",
-        "- source: zródła na których oparłeś artykuł, powienien tu być dokładny link wpisu/artykułu;",
-        "- media: lista 0-5 obiektów opisujących multimedia do posta.",
-        (
-            "Każdy obiekt media powinien zawierać resolver "
-            "(np. twitter/telegram/instagram/rss) oraz reference – obiekt z prawdziwymi"
-            " identyfikatorami źródła (np. {\"tg_post_url\": \"https://t.me/...\","
-            " \"posted_at\": \"2024-06-09T10:32:00Z\"})."
-            "Jeśli jest to strona www, podaj url media zdjęcie/video z artykułu"
-        ),
-        "Pole reference.source_locator musi zawierać dokładny link lub identyfikator wpisu źródłowego.",
-
-        "Używaj wyłącznie angielskich nazw pól w formacie snake_case (ASCII, bez spacji i znaków diakrytycznych).",
-        (
-            "Jeśli media pochodzą z artykułu lub innego źródła, dołącz dostępne metadane"
-            " (caption (max 20znaków), posted_at, author)."
-        ),
-        "Pole has_spoiler (true/false) jest opcjonalne i dotyczy wyłącznie zdjęć wymagających ukrycia.",
-        "Treść posta oraz wszystkie media muszą opisywać to samo wydarzenie.",
-    ]
+    instructions = list(_DRAFT_PROMPT_INSTRUCTIONS)
 
     article_context = _article_context(article)
     if article_context:
@@ -1373,15 +1472,7 @@ def _normalise_media_payload(media: Any, fallback_prompt: str) -> list[dict[str,
             if not val:
                 continue
             lower_val = val.lower()
-            if lower_val == key.lower():
-                logger.warning(
-                    "Pomijam placeholder identyfikatora %s=%s w media %s",
-                    key,
-                    val,
-                    entry,
-                )
-                continue
-            if lower_val in _PLACEHOLDER_IDENTIFIER_VALUES:
+            if lower_val == key.lower() or lower_val in _PLACEHOLDER_IDENTIFIER_VALUES:
                 logger.warning(
                     "Pomijam placeholder identyfikatora %s=%s w media %s",
                     key,
@@ -1472,6 +1563,23 @@ def _media_source_snapshot(item: dict[str, Any]) -> dict[str, Any]:
     return snapshot
 
 
+_DOC_MIME_TYPES = frozenset(
+    {
+        "application/pdf",
+        "application/zip",
+        "application/x-zip-compressed",
+        "application/x-rar-compressed",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "application/vnd.ms-powerpoint",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "application/msword",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "application/vnd.ms-excel",
+    }
+)
+
+
+@lru_cache(maxsize=256)
 def _guess_extension(media_type: str, content_type: str | None = None) -> str:
     if content_type:
         guessed = mimetypes.guess_extension(content_type.split(";")[0].strip())
@@ -1486,30 +1594,18 @@ def _guess_extension(media_type: str, content_type: str | None = None) -> str:
     return ".bin"
 
 
+@lru_cache(maxsize=256)
 def _detect_media_type(ext: str, content_type: str | None = None) -> str | None:
     ext = (ext or "").lower()
     mime = (content_type or "").split(";")[0].strip().lower()
 
-    doc_mime_prefixes = {
-        "application/pdf",
-        "application/zip",
-        "application/x-zip-compressed",
-        "application/x-rar-compressed",
-        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        "application/vnd.ms-powerpoint",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "application/msword",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        "application/vnd.ms-excel",
-    }
-
     if mime == "image/gif":
         return "doc"
     if mime.startswith("image/"):
         return "photo"
     if mime.startswith("video/"):
         return "video"
-    if mime in doc_mime_prefixes:
+    if mime in _DOC_MIME_TYPES:
         return "doc"
 
     if ext in {".gif"}:
@@ -1534,6 +1630,63 @@ def _detect_media_type(ext: str, content_type: str | None = None) -> str | None:
     return None
 
 
+_BASE64_CHUNK_CHARS = 64 * 1024
+_BASE64_JUNK_RE = re.compile(r"[^A-Za-z0-9+/=]")
+
+
+def _write_all(fd: int, content: bytes) -> None:
+    view = memoryview(content)
+    while view:
+        # os.write może zapisać mniej niż całość (np. po sygnale), więc dopisujemy resztę.
+        view = view[os.write(fd, view):]
+
+
+def _write_file(path: Path, content: bytes) -> None:
+    """Zapisuje bajty bezpośrednio do deskryptora, z pominięciem bufora io."""
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _write_all(fd, content)
+    finally:
+        os.close(fd)
+
+
+def _write_base64_file(path: Path, content_b64: str) -> int:
+    """Dekoduje base64 porcjami prosto do pliku; zwraca liczbę zapisanych bajtów.
+
+    Tak jak ``base64.b64decode`` pomija znaki spoza alfabetu (np. złamania linii),
+    dlatego do dekodowania trafiają zawsze pełne czwórki znaków.
+    """
+
+    written = 0
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        carry = ""
+        for start in range(0, len(content_b64), _BASE64_CHUNK_CHARS):
+            chunk = carry + _BASE64_JUNK_RE.sub("", content_b64[start : start + _BASE64_CHUNK_CHARS])
+            usable = len(chunk) - len(chunk) % 4
+            carry = chunk[usable:]
+            if usable:
+                data = binascii.a2b_base64(chunk[:usable])
+                _write_all(fd, data)
+                written += len(data)
+        if carry:
+            # Niepełna końcówka – a2b_base64 zgłosi błąd paddingu jak b64decode.
+            data = binascii.a2b_base64(carry)
+            _write_all(fd, data)
+            written += len(data)
+    finally:
+        os.close(fd)
+    return written
+
+
+def _resolved_media_path(media_type: str, content_type: str | None) -> Path:
+    cache_dir = Path(settings.MEDIA_ROOT) / "resolved"
+    os.makedirs(cache_dir, exist_ok=True)
+    ext = _guess_extension(media_type, content_type)
+    return cache_dir / f"{uuid.uuid4().hex}{ext}"
+
+
 def _persist_resolved_media(
     *,
     content: bytes,
@@ -1544,14 +1697,35 @@ def _persist_resolved_media(
 ) -> str:
     if not content:
         return ""
-    media_root = Path(settings.MEDIA_ROOT)
-    cache_dir = media_root / "resolved"
-    os.makedirs(cache_dir, exist_ok=True)
-    ext = _guess_extension(media_type, content_type)
-    fname = cache_dir / f"{uuid.uuid4().hex}{ext}"
+    fname = _resolved_media_path(media_type, content_type)
+    try:
+        _write_file(fname, content)
+    except Exception:
+        logger.exception(
+            "Nie udało się zapisać pliku z resolvera %s (media=%s, ref=%s)",
+            resolver,
+            media_type,
+            reference,
+        )
+        return ""
+    return fname.as_posix()
+
+
+def _persist_resolved_base64(
+    *,
+    content_b64: str,
+    media_type: str,
+    resolver: str,
+    reference: dict[str, Any],
+    content_type: str | None = None,
+) -> str:
+    fname = _resolved_media_path(media_type, content_type)
     try:
-        with open(fname, "wb") as fh:
-            fh.write(content)
+        written = _write_base64_file(fname, content_b64)
+    except (binascii.Error, TypeError, ValueError):
+        logger.exception("Nie udało się zdekodować treści base64 z resolvera %s", resolver)
+        fname.unlink(missing_ok=True)
+        return ""
     except Exception:
         logger.exception(
             "Nie udało się zapisać pliku z resolvera %s (media=%s, ref=%s)",
@@ -1560,6 +1734,9 @@ def _persist_resolved_media(
             reference,
         )
         return ""
+    if not written:
+        fname.unlink(missing_ok=True)
+        return ""
     return fname.as_posix()
 
 
@@ -1575,20 +1752,12 @@ def _resolve_media_reference(
         return ""
 
     def _reference_fallback_url() -> str:
-        for key in (
-            "media_url",
-            "direct_url",
-            "download_url",
-            "source_url",
-            "tg_post_url",
-            "source_locator",
-            "tweet_url",
-            "permalink",
-            "url",
-        ):
+        for key in _REFERENCE_FALLBACK_URL_KEYS:
             value = reference.get(key)
-            if isinstance(value, str) and value.strip():
-                return value.strip()
+            if isinstance(value, str):
+                value = value.strip()
+                if value:
+                    return value
         return ""
 
     fallback_url = _reference_fallback_url()
@@ -1641,7 +1810,7 @@ def _resolve_media_reference(
     timeout_s = float(os.getenv("MEDIA_RESOLVER_TIMEOUT", 30))
 
     try:
-        response = httpx.post(endpoint, json=payload, timeout=timeout_s)
+        response = _http_client().post(endpoint, json=payload, timeout=timeout_s)
         response.raise_for_status()
     except httpx.HTTPStatusError as exc:
         logger.warning(
@@ -1675,13 +1844,8 @@ def _resolve_media_reference(
             return download_url
         content_b64 = data.get("content_base64")
         if content_b64:
-            try:
-                binary = base64.b64decode(content_b64)
-            except Exception:
-                logger.exception("Nie udało się zdekodować treści base64 z resolvera %s", resolver)
-                return ""
-            persisted = _persist_resolved_media(
-                content=binary,
+            persisted = _persist_resolved_base64(
+                content_b64=content_b64,
                 media_type=media_type,
                 resolver=resolver,
                 reference=reference,
@@ -1720,9 +1884,6 @@ def _resolve_media_reference(
 
 
 def _first_url_from(value: Any) -> str:
-    url_keys = ("source_url", "download_url", "url", "image_url", "href")
-    nested_keys = ("source", "asset", "file", "image", "media", "items", "data", "results", "variants")
-
     stack: list[Any] = [value]
     while stack:
         current = stack.pop()
@@ -1732,11 +1893,13 @@ def _first_url_from(value: Any) -> str:
                 return candidate
             continue
         if isinstance(current, dict):
-            for key in url_keys:
+            for key in _URL_KEYS:
                 raw_url = current.get(key)
-                if isinstance(raw_url, str) and raw_url.strip():
-                    return raw_url.strip()
-            for key in nested_keys:
+                if isinstance(raw_url, str):
+                    raw_url = raw_url.strip()
+                    if raw_url:
+                        return raw_url
+            for key in _NESTED_URL_KEYS:
                 nested = current.get(key)
                 if nested:
                     stack.append(nested)
@@ -1776,6 +1939,42 @@ def _resolve_with_builtin_resolver(
     return ""
 
 
+def _reusable_telegram_media(tg_url: str, media_type: str, channel: Channel) -> tuple[str, str] | None:
+    """Zwraca (URI pliku, tg_file_id) medium już pobranego z tego posta Telegram.
+
+    Albumy pomijamy – pozostałe części przychodzą tylko przy świeżym pobraniu.
+    tg_file_id działa tylko dla bota, który wysłał plik, więc dla innego bota
+    zwracamy sam plik z cache i pusty identyfikator.
+    """
+
+    tg_url = tg_url.strip()
+    if not tg_url:
+        return None
+    rows = list(
+        PostMedia.objects.filter(reference_data__tg_post_url=tg_url)
+        .exclude(cache_path="")
+        .order_by("-id")
+        .values_list(
+            "post_id",
+            "type",
+            "cache_path",
+            "tg_file_id",
+            "post__channel_id",
+            "post__channel__bot_token",
+        )[:2]
+    )
+    if not rows:
+        return None
+    post_id, stored_type, cache_path, tg_file_id, channel_id, bot_token = rows[0]
+    if len(rows) > 1 and rows[1][0] == post_id:
+        return None
+    if stored_type != media_type or not os.path.exists(cache_path):
+        return None
+    token = (bot_token or "").strip()
+    same_bot = channel_id == channel.pk or (token and token == (channel.bot_token or "").strip())
+    return Path(cache_path).absolute().as_uri(), tg_file_id if same_bot else ""
+
+
 def _resolve_media_via_telegram(
     reference: dict[str, Any],
     media_type: str,
@@ -2206,6 +2405,7 @@ def _attach_additional_telegram_album_media(
     extras: List[Dict[str, str]],
 ) -> tuple[int, list[dict[str, Any]]]:
     snapshots: list[dict[str, Any]] = []
+    pending: list[tuple[PostMedia, dict[str, Any], dict[str, Any]]] = []
     for extra in extras:
         extra_url = str(extra.get("uri") or extra.get("url") or "").strip()
         if not extra_url:
@@ -2225,7 +2425,7 @@ def _attach_additional_telegram_album_media(
             "status": "pending",
             "auto_album": True,
         }
-        pm_extra = PostMedia.objects.create(
+        pm_extra = PostMedia(
             post=post,
             type=extra_type,
             source_url=extra_url,
@@ -2235,6 +2435,13 @@ def _attach_additional_telegram_album_media(
             has_spoiler=has_spoiler,
         )
         next_order += 1
+        pending.append((pm_extra, extra_reference, extra_snapshot))
+
+    # Jeden INSERT na cały album; cache_media potrzebuje już nadanych id.
+    PostMedia.objects.bulk_create([pm_extra for pm_extra, _, _ in pending])
+    failed_ids: list[int] = []
+    for pm_extra, extra_reference, extra_snapshot in pending:
+        extra_url = pm_extra.source_url
         try:
             cache_path = cache_media(pm_extra)
         except Exception:
@@ -2243,7 +2450,7 @@ def _attach_additional_telegram_album_media(
                 extra_url,
                 post.id,
             )
-            pm_extra.delete()
+            failed_ids.append(pm_extra.id)
             extra_snapshot["status"] = "error"
             extra_snapshot["error"] = "cache_failure"
             snapshots.append(extra_snapshot)
@@ -2255,7 +2462,7 @@ def _attach_additional_telegram_album_media(
                 post.id,
                 extra_url,
             )
-            pm_extra.delete()
+            failed_ids.append(pm_extra.id)
             extra_snapshot["status"] = "skipped"
             extra_snapshot["error"] = "empty_cache"
             snapshots.append(extra_snapshot)
@@ -2264,9 +2471,63 @@ def _attach_additional_telegram_album_media(
         extra_snapshot["status"] = "cached"
         extra_snapshot["reference"] = dict(extra_reference)
         snapshots.append(extra_snapshot)
+    if failed_ids:
+        PostMedia.objects.filter(id__in=failed_ids).delete()
     return next_order, snapshots
 
 
+def _resolve_media_batch(post_id: int | None, entries: list[dict[str, Any]]) -> list[str]:
+    """Rozwiązuje referencje mediów równolegle; wyniki w kolejności ``entries``.
+
+    Pozycje z tego samego posta Telegram idą po kolei w jednym wątku – pierwsza
+    pobiera album, kolejne biorą swoje części z cache resolvera.
+    """
+
+    def _resolve(entry: dict[str, Any]) -> str:
+        resolver_name = entry["resolver"]
+        logger.info(
+            "Resolving media via %s for post %s (ref=%s)",
+            resolver_name or "unknown",
+            post_id,
+            entry["reference"],
+        )
+        source_url = _resolve_media_reference(
+            resolver=resolver_name,
+            reference=dict(entry["reference"]),
+            media_type=entry["type"],
+            caption=entry["caption"],
+        )
+        if source_url:
+            logger.info(
+                "Resolved media for post %s via %s (url=%s)",
+                post_id,
+                resolver_name or "unknown",
+                source_url,
+            )
+        return source_url
+
+    groups: dict[Any, list[int]] = {}
+    for index, entry in enumerate(entries):
+        tg_url = str(entry["reference"].get("tg_post_url") or "").strip()
+        groups.setdefault(tg_url or index, []).append(index)
+
+    results = [""] * len(entries)
+
+    def _resolve_group(indexes: list[int]) -> None:
+        for index in indexes:
+            results[index] = _resolve(entries[index])
+
+    if len(groups) <= 1:
+        for indexes in groups.values():
+            _resolve_group(indexes)
+        return results
+    workers = min(_MEDIA_RESOLVE_WORKERS, len(groups))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media-resolve") as executor:
+        # list() propaguje ewentualny wyjątek z wątku tak jak przy pętli sekwencyjnej.
+        list(executor.map(_resolve_group, groups.values()))
+    return results
+
+
 def attach_media_from_payload(post: Post, media_payload: list[dict[str, Any]]):
     post.media.all().delete()
     telegram_counts: dict[str, int] = {}
@@ -2280,9 +2541,9 @@ def attach_media_from_payload(post: Post, media_payload: list[dict[str, Any]]):
         if tg_url:
             telegram_counts[tg_url] = telegram_counts.get(tg_url, 0) + 1
 
-    processed_albums: set[str] = set()
-    source_entries: list[dict[str, Any]] = []
-    next_order = 0
+    # Najpierw przygotowujemy wszystkie pozycje (w tym odczyty z bazy), potem
+    # równolegle rozwiązujemy brakujące URL-e, a zapisy do bazy robimy na końcu po kolei.
+    prepared: list[dict[str, Any]] = []
     for item in media_payload:
         if not isinstance(item, dict):
             continue
@@ -2292,7 +2553,7 @@ def attach_media_from_payload(post: Post, media_payload: list[dict[str, Any]]):
         if media_type not in {"photo", "video", "doc"}:
             snapshot = _media_source_snapshot(item)
             snapshot.update({"status": "skipped", "error": "unsupported_type"})
-            source_entries.append(snapshot)
+            prepared.append({"skipped": snapshot})
             continue
 
         snapshot = _media_source_snapshot(item)
@@ -2318,29 +2579,56 @@ def attach_media_from_payload(post: Post, media_payload: list[dict[str, Any]]):
             "status": "pending",
         }
 
+        reused_file_id = ""
+        if not source_url and resolver_name == "telegram":
+            reused = _reusable_telegram_media(
+                str(reference_data.get("tg_post_url") or ""), media_type, post.channel
+            )
+            if reused:
+                source_url, reused_file_id = reused
+                logger.info("Używam wcześniej pobranego medium Telegram dla posta %s (%s)", post.id, source_url)
+
+        prepared.append(
+            {
+                "item": item,
+                "type": media_type,
+                "resolver": resolver_name,
+                "reference": reference_data,
+                "caption": caption,
+                "posted_at": posted_at,
+                "source_url": source_url,
+                "source_entry": source_entry,
+                "tg_file_id": reused_file_id,
+            }
+        )
+
+    pending = [
+        entry
+        for entry in prepared
+        if "skipped" not in entry and not entry["source_url"] and entry["resolver"] and entry["reference"]
+    ]
+    resolved_urls = _resolve_media_batch(post.id, pending)
+    for entry, resolved_url in zip(pending, resolved_urls):
+        entry["source_url"] = resolved_url
+
+    processed_albums: set[str] = set()
+    source_entries: list[dict[str, Any]] = []
+    next_order = 0
+    for entry in prepared:
+        if "skipped" in entry:
+            source_entries.append(entry["skipped"])
+            continue
+        item = entry["item"]
+        media_type = entry["type"]
+        resolver_name = entry["resolver"]
+        reference_data = entry["reference"]
+        caption = entry["caption"]
+        posted_at = entry["posted_at"]
+        source_url = entry["source_url"]
+        source_entry = entry["source_entry"]
+        reused_file_id = entry["tg_file_id"]
+
         if not source_url:
-            if resolver_name and reference_data:
-                logger.info(
-                    "Resolving media via %s for post %s (ref=%s)",
-                    resolver_name or "unknown",
-                    post.id,
-                    reference_data,
-                )
-                resolve_input = dict(reference_data)
-                source_url = _resolve_media_reference(
-                    resolver=resolver_name,
-                    reference=resolve_input,
-                    media_type=media_type,
-                    caption=caption,
-                )
-                if source_url:
-                    logger.info(
-                        "Resolved media for post %s via %s (url=%s)",
-                        post.id,
-                        resolver_name or "unknown",
-                        source_url,
-                    )
-            if not source_url:
                 logger.warning(
                     "Nie udało się pobrać medium typu %s dla posta %s (resolver=%s, reference=%s)",
                     media_type,
@@ -2373,6 +2661,7 @@ def attach_media_from_payload(post: Post, media_payload: list[dict[str, Any]]):
             reference_data=reference_data,
             order=next_order,
             has_spoiler=has_spoiler,
+            tg_file_id=reused_file_id,
         )
         next_order += 1
         try:
@@ -2564,6 +2853,23 @@ def purge_cache():
             pm.cache_path = ""
             pm.save()
 
+
+def _link_or_copy(src: str, dst: Path) -> None:
+    """Umieszcza plik lokalny w cache bez przepuszczania bajtów przez Pythona."""
+
+    # Źródło nie jest przenoszone, bo PostMedia.source_url nadal na nie wskazuje.
+    if dst.exists() and not os.path.samefile(src, dst):
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        return
+    except OSError:
+        # Inny system plików (EXDEV) albo brak obsługi twardych linków: copyfile
+        # kopiuje w jądrze przez sendfile.
+        shutil.copyfile(src, dst)
+
+
 def cache_media(pm: PostMedia):
     if pm.cache_path and os.path.exists(pm.cache_path):
         return pm.cache_path
@@ -2578,6 +2884,7 @@ def cache_media(pm: PostMedia):
     path = parsed.path or ""
     ext = os.path.splitext(path)[-1].lower()
     content: bytes | None = None
+    local_src: str | None = None
     detected_type: str | None = None
     content_type: str | None = None
     original_type = pm.type
@@ -2594,7 +2901,7 @@ def cache_media(pm: PostMedia):
         response: httpx.Response | None = None
         while attempt < max_attempts:
             try:
-                response = httpx.get(url, timeout=timeout_s, follow_redirects=True)
+                response = _http_client().get(url, timeout=timeout_s, follow_redirects=True)
                 response.raise_for_status()
                 break
             except httpx.HTTPStatusError as exc:
@@ -2664,12 +2971,7 @@ def cache_media(pm: PostMedia):
                 src = candidate.as_posix()
         if not os.path.exists(src):
             return pm.cache_path or ""
-        try:
-            with open(src, "rb") as fh:
-                content = fh.read()
-        except Exception:
-            logger.exception("Nie udało się odczytać pliku %s dla media %s", src, pm.id)
-            return pm.cache_path or ""
+        local_src = src
         if not ext:
             ext = os.path.splitext(src)[-1] or ".bin"
         if not content_type:
@@ -2678,8 +2980,13 @@ def cache_media(pm: PostMedia):
 
     fname = cache_dir / f"{pm.id}{ext}"
     try:
-        with open(fname, "wb") as fh:
-            fh.write(content)
+        if local_src:
+            _link_or_copy(local_src, fname)
+        else:
+            with open(fname, "wb") as fh:
+                fh.write(content)
+    except shutil.SameFileError:
+        pass
     except Exception:
         logger.exception("Nie udało się zapisać pliku cache %s dla media %s", fname, pm.id)
         return pm.cache_path or ""
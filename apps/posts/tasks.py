@@ -243,6 +243,16 @@ def _reset_to_draft_for_manual_fix(post: Post) -> None:
     post.save(update_fields=sorted(update_fields))
 
 
+@shared_task
+def task_assign_auto_slot(post_id: int):
+    post = Post.objects.select_related("channel").filter(id=post_id).first()
+    if post is None or post.status != Post.Status.APPROVED:
+        logger.info("Post %s nie czeka już na slot AUTO, pomijam.", post_id)
+        return None
+    services.assign_auto_slot(post)
+    return post.scheduled_at.isoformat() if post.scheduled_at else None
+
+
 @shared_task
 def publish_post(post_id: int):
     post = Post.objects.select_related("channel").get(id=post_id)
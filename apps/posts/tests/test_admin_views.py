@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, set_script_prefix
+from django.utils import timezone
+
+from apps.posts.admin import (
+    PostForm,
+    admin_object_url_template,
+    field_choice_labels,
+    media_display_name,
+    media_url_from_paths,
+)
+from apps.posts import tasks
+from apps.posts.models import Channel, DraftPost, Post, PostMedia
+
+
+class PostStatusViewTest(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass1234")
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.post = Post.objects.create(
+            channel=self.channel,
+            text="Treść",
+            status=Post.Status.SCHEDULED,
+            scheduled_at=timezone.now(),
+        )
+        PostMedia.objects.create(
+            post=self.post,
+            type="photo",
+            source_url="https://cdn.example/photo.jpg",
+        )
+        self.client.force_login(self.user)
+
+    def test_returns_post_state_as_json(self) -> None:
+        url = reverse("admin:posts_scheduledpost_status", args=[self.post.pk])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        data = response.json()
+        self.assertEqual(data["post"]["id"], self.post.pk)
+        self.assertEqual(data["post"]["status"], Post.Status.SCHEDULED)
+        self.assertEqual(data["post"]["channel_name"], "Kanał")
+        self.assertEqual(len(data["media"]), 1)
+        self.assertEqual(data["media"][0]["name"], "photo.jpg")
+        self.assertEqual(data["rewrite"], {})
+
+    def test_rejects_non_get_requests(self) -> None:
+        url = reverse("admin:posts_scheduledpost_status", args=[self.post.pk])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 403)
+
+
+class FillToTargetActionTest(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass1234")
+        self.channel = Channel.objects.create(
+            name="Kanał", slug="kanal", tg_channel_id="@kanal", draft_target_count=3
+        )
+        self.other = Channel.objects.create(
+            name="Inny", slug="inny", tg_channel_id="@inny", draft_target_count=5
+        )
+        self.post = Post.objects.create(channel=self.channel, text="Draft", status=Post.Status.DRAFT)
+        PostMedia.objects.create(post=self.post, type="photo", source_url="https://cdn.example/a.jpg")
+        self.client.force_login(self.user)
+
+    @patch("apps.posts.admin.group")
+    def test_queues_only_channels_of_selected_posts(self, group_mock) -> None:
+        response = self.client.post(
+            reverse("admin:posts_draftpost_changelist"),
+            {"action": "act_fill_to_target", "_selected_action": [self.post.pk]},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        group_mock.return_value.apply_async.assert_called_once_with()
+        signatures = list(group_mock.call_args.args[0])
+        self.assertEqual([signature.args for signature in signatures], [(self.channel.id, 2)])
+
+
+class PublishNowActionTest(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass1234")
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.due = Post.objects.create(
+            channel=self.channel, text="A", status=Post.Status.SCHEDULED, scheduled_at=timezone.now()
+        )
+        self.scheduled = Post.objects.create(
+            channel=self.channel,
+            text="B",
+            status=Post.Status.SCHEDULED,
+            scheduled_at=timezone.now() + timezone.timedelta(hours=1),
+        )
+        self.client.force_login(self.user)
+
+    @patch("apps.posts.admin.group")
+    def test_dispatches_publications_as_one_group(self, group_mock) -> None:
+        response = self.client.post(
+            reverse("admin:posts_scheduledpost_changelist"),
+            {"action": "act_publish_now", "_selected_action": [self.due.pk, self.scheduled.pk]},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        group_mock.return_value.apply_async.assert_called_once_with()
+        signatures = list(group_mock.call_args.args[0])
+        self.assertCountEqual(
+            [signature.args for signature in signatures],
+            [(self.due.pk,), (self.scheduled.pk,)],
+        )
+        self.scheduled.refresh_from_db()
+        self.assertLessEqual(self.scheduled.scheduled_at, timezone.now())
+
+
+class ApproveActionTest(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass1234")
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.drafts = [
+            Post.objects.create(channel=self.channel, text=f"Draft {index}", status=Post.Status.DRAFT)
+            for index in range(2)
+        ]
+        self.client.force_login(self.user)
+
+    @patch("apps.posts.admin.group")
+    def test_approves_in_bulk_and_defers_slots(self, group_mock) -> None:
+        ids = [post.pk for post in self.drafts]
+        response = self.client.post(
+            reverse("admin:posts_draftpost_changelist"),
+            {"action": "act_approve", "_selected_action": ids},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        signatures = list(group_mock.call_args.args[0])
+        self.assertCountEqual([signature.args for signature in signatures], [(pk,) for pk in ids])
+        for post in Post.objects.filter(pk__in=ids):
+            self.assertEqual(post.status, Post.Status.APPROVED)
+            self.assertEqual(post.approved_by, self.user)
+            self.assertIsNone(post.expires_at)
+
+        for pk in ids:
+            tasks.task_assign_auto_slot(pk)
+        slots = {post.scheduled_at for post in Post.objects.filter(pk__in=ids)}
+        self.assertEqual(len(slots), 2)
+        self.assertEqual(
+            set(Post.objects.filter(pk__in=ids).values_list("status", flat=True)),
+            {Post.Status.SCHEDULED},
+        )
+
+    @patch("apps.posts.tasks.publish_post.delay")
+    @patch("apps.posts.admin.group")
+    def test_approve_clears_stale_slot_before_publish_due(self, group_mock, delay_mock) -> None:
+        draft = self.drafts[0]
+        draft.scheduled_at = timezone.now() - timezone.timedelta(hours=1)
+        draft.save(update_fields=["scheduled_at"])
+
+        self.client.post(
+            reverse("admin:posts_draftpost_changelist"),
+            {"action": "act_approve", "_selected_action": [draft.pk]},
+        )
+        tasks.task_publish_due()
+
+        delay_mock.assert_not_called()
+        draft.refresh_from_db()
+        self.assertEqual(draft.status, Post.Status.APPROVED)
+        self.assertIsNone(draft.scheduled_at)
+
+
+class PostMediaRelatedPostsTest(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass1234")
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.first = Post.objects.create(channel=self.channel, text="Pierwszy")
+        self.second = Post.objects.create(channel=self.channel, text="Drugi")
+        self.third = Post.objects.create(channel=self.channel, text="Trzeci")
+        tg_url = "https://t.me/source/10"
+        self.first_media = PostMedia.objects.create(
+            post=self.first, type="photo", reference_data={"tg_post_url": tg_url}
+        )
+        PostMedia.objects.create(post=self.second, type="photo", reference_data={"original_url": tg_url})
+        self.url_media = PostMedia.objects.create(
+            post=self.third, type="photo", source_url="https://cdn.example/shared.jpg"
+        )
+        PostMedia.objects.create(post=self.first, type="photo", source_url="https://cdn.example/shared.jpg")
+        self.client.force_login(self.user)
+
+    def _admin(self):
+        return admin.site._registry[PostMedia]
+
+    def test_changelist_primes_related_posts_for_whole_page(self) -> None:
+        request = RequestFactory().get(reverse("admin:posts_postmedia_changelist"))
+        request.user = self.user
+        model_admin = self._admin()
+        model_admin.get_changelist_instance(request)
+
+        with self.assertNumQueries(0):
+            related = model_admin._get_related_posts(self.first_media)
+            by_url = model_admin._get_related_posts(self.url_media)
+
+        self.assertEqual([post.id for post in related], [self.second.id])
+        self.assertEqual([post.id for post in by_url], [self.first.id])
+
+    @override_settings(
+        STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        }
+    )
+    def test_changelist_renders_related_posts(self) -> None:
+        response = self.client.get(reverse("admin:posts_postmedia_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f"#{self.second.id} – Kanał")
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class PostChangelistQueriesTest(TestCase):
+    def setUp(self) -> None:
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass1234")
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.client.force_login(self.user)
+
+    def _add_post(self, index: int) -> Post:
+        post = Post.objects.create(channel=self.channel, text=f"Draft {index}", approved_by=self.user)
+        PostMedia.objects.create(post=post, type="photo", source_url=f"https://cdn.example/{index}.jpg")
+        PostMedia.objects.create(post=post, type="video", source_url=f"https://cdn.example/{index}.mp4")
+        return post
+
+    def _count_changelist_queries(self) -> int:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:posts_draftpost_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self) -> None:
+        self._add_post(0)
+        single = self._count_changelist_queries()
+        for index in range(1, 5):
+            self._add_post(index)
+        self.assertEqual(self._count_changelist_queries(), single)
+
+    def test_history_table_skips_card_previews(self) -> None:
+        post = self._add_post(0)
+        Post.objects.filter(pk=post.pk).update(status=Post.Status.PUBLISHED, published_at=timezone.now())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:posts_historypost_changelist"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any("posts_postmedia" in query["sql"] for query in ctx.captured_queries))
+
+    def test_history_table_reads_only_text_excerpt(self) -> None:
+        post = Post.objects.create(channel=self.channel, text="x" * 200)
+        Post.objects.filter(pk=post.pk).update(status=Post.Status.PUBLISHED, published_at=timezone.now())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:posts_historypost_changelist"))
+        self.assertContains(response, "x" * 80 + "…")
+        list_query = next(q["sql"] for q in ctx.captured_queries if "short_text" in q["sql"])
+        self.assertNotIn('"posts_post"."source_metadata"', list_query)
+
+    def test_cards_render_media_in_order(self) -> None:
+        self._add_post(0)
+        response = self.client.get(reverse("admin:posts_draftpost_changelist"))
+        content = response.content.decode()
+        self.assertLess(content.index("https://cdn.example/0.jpg"), content.index("https://cdn.example/0.mp4"))
+
+
+class AdminObjectUrlTemplateTest(TestCase):
+    def setUp(self) -> None:
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.post = Post.objects.create(channel=self.channel, text="Treść")
+
+    def test_object_urls_match_reverse(self) -> None:
+        model_admin = admin.site._registry[DraftPost]
+        for action in ("change", "delete", "reschedule", "rewrite", "approve"):
+            self.assertEqual(
+                model_admin._object_url(self.post, action),
+                reverse(f"admin:posts_draftpost_{action}", args=[self.post.pk]),
+            )
+
+    def test_template_follows_current_script_prefix(self) -> None:
+        model_admin = admin.site._registry[DraftPost]
+        self.addCleanup(set_script_prefix, "/")
+        for script_prefix in ("/a/", "/b/"):
+            set_script_prefix(script_prefix)
+            with self.subTest(script_prefix=script_prefix):
+                self.assertEqual(
+                    model_admin._object_url(self.post, "change"),
+                    reverse("admin:posts_draftpost_change", args=[self.post.pk]),
+                )
+                self.assertTrue(model_admin._object_url(self.post, "change").startswith(script_prefix))
+
+    def test_changelist_url_follows_current_script_prefix(self) -> None:
+        model_admin = admin.site._registry[DraftPost]
+        self.addCleanup(set_script_prefix, "/")
+        for script_prefix in ("/a/", "/b/"):
+            set_script_prefix(script_prefix)
+            with self.subTest(script_prefix=script_prefix):
+                self.assertEqual(model_admin._changelist_url(), reverse("admin:posts_draftpost_changelist"))
+                self.assertTrue(model_admin._changelist_url().startswith(script_prefix))
+
+    def test_unregistered_model_has_no_template(self) -> None:
+        self.assertIsNone(admin_object_url_template("posts", "post", "change"))
+        self.assertEqual(
+            admin.site._registry[PostMedia]._reverse_post_change_url(self.post, self.post.pk),
+            reverse("admin:posts_draftpost_change", args=[self.post.pk]),
+        )
+
+
+class FieldChoiceLabelsTest(TestCase):
+    def test_labels_are_built_once_per_field(self) -> None:
+        labels = field_choice_labels(Post, "status")
+        self.assertIs(field_choice_labels(Post, "status"), labels)
+        self.assertEqual(labels[Post.Status.DRAFT], Post.Status.DRAFT.label)
+        self.assertEqual(admin.site._registry[DraftPost]._choice_label("status", "???"), "???")
+
+
+class PreviewMediaTest(TestCase):
+    def setUp(self) -> None:
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.post = Post.objects.create(channel=self.channel, text="Treść")
+        PostMedia.objects.create(
+            post=self.post, type="video", order=1, source_url="https://cdn.example/clip.mp4"
+        )
+        PostMedia.objects.create(
+            post=self.post,
+            type="photo",
+            order=0,
+            source_url="https://cdn.example/photo.jpg",
+            resolver="telegram",
+            reference_data={"tg_post_url": "https://t.me/source/1"},
+        )
+        PostMedia.objects.create(post=self.post, type="photo", order=2)
+        self.model_admin = admin.site._registry[DraftPost]
+
+    def test_builds_entries_from_column_values(self) -> None:
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(1):
+            preview = self.model_admin._build_preview_media(post)
+
+        self.assertEqual([entry["name"] for entry in preview], ["photo.jpg", "clip.mp4"])
+        self.assertEqual(preview[0]["resolver"], "telegram")
+        self.assertEqual(preview[0]["reference"], {"tg_post_url": "https://t.me/source/1"})
+        self.assertEqual(preview[1]["src"], "https://cdn.example/clip.mp4")
+
+    def test_builds_entries_for_a_page_in_one_query(self) -> None:
+        other = Post.objects.create(channel=self.channel, text="Inny")
+        PostMedia.objects.create(post=other, type="photo", source_url="https://cdn.example/other.jpg")
+        empty = Post.objects.create(channel=self.channel, text="Pusty")
+        with self.assertNumQueries(1):
+            by_post = self.model_admin._build_preview_media_by_post([self.post, other, empty])
+
+        self.assertEqual([entry["name"] for entry in by_post[self.post.pk]], ["photo.jpg", "clip.mp4"])
+        self.assertEqual([entry["name"] for entry in by_post[other.pk]], ["other.jpg"])
+        self.assertNotIn(empty.pk, by_post)
+
+    def test_unsaved_post_has_no_preview(self) -> None:
+        with self.assertNumQueries(0):
+            self.assertEqual(self.model_admin._build_preview_media(Post(channel=self.channel)), [])
+
+
+class PreviewContextChannelTest(TestCase):
+    def setUp(self) -> None:
+        self.channel = Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        self.other = Channel.objects.create(name="Inny", slug="inny", tg_channel_id="@inny")
+        self.post = Post.objects.create(channel=self.channel, text="Treść")
+        self.model_admin = admin.site._registry[DraftPost]
+
+    def _context(self, channel: Channel, validate: bool) -> tuple[object, dict]:
+        data = {"channel": str(channel.pk), "text": "Nowa treść", "status": Post.Status.DRAFT}
+        request = RequestFactory().post("/", data)
+        form = PostForm(data, instance=self.post)
+        if validate:
+            form.is_valid()
+        return request, {"adminform": admin.helpers.AdminForm(form, [], {})}
+
+    def test_reuses_loaded_channels(self) -> None:
+        post = Post.objects.select_related("channel").get(pk=self.post.pk)
+        request, context = self._context(self.channel, validate=False)
+        with self.assertNumQueries(1):
+            preview = self.model_admin._build_preview_context(request, context, post)
+        self.assertEqual(preview["channel_name"], "Kanał")
+
+        request, context = self._context(self.other, validate=True)
+        with self.assertNumQueries(1):
+            preview = self.model_admin._build_preview_context(request, context, post)
+        self.assertEqual(preview["channel_name"], "Inny")
+
+
+class ChannelChoicesTest(TestCase):
+    def test_channel_dropdown_defers_prompt_columns(self) -> None:
+        Channel.objects.create(name="Kanał", slug="kanal", tg_channel_id="@kanal")
+        request = RequestFactory().get("/")
+        request.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass1234")
+        form_class = admin.site._registry[DraftPost].get_form(request)
+        channel = form_class.base_fields["channel"].queryset.get()
+        self.assertEqual(channel.get_deferred_fields(), {"style_prompt", "footer_text"})
+
+
+class MediaUrlFromPathsTest(TestCase):
+    def test_maps_cached_file_under_media_root(self) -> None:
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            for root in (first, second):
+                with override_settings(MEDIA_ROOT=root):
+                    cached = os.path.join(root, "cache", "1.jpg")
+                    self.assertEqual(media_url_from_paths(cached, "https://x"), "/media/cache/1.jpg")
+
+    def test_display_name_is_last_path_segment(self) -> None:
+        self.assertEqual(media_display_name("/var/app/media/cache/1.jpg"), "1.jpg")
+        self.assertEqual(media_display_name("https://cdn.example/dir/clip.mp4"), "clip.mp4")
+        self.assertEqual(media_display_name("https://cdn.example/dir/"), "dir")
+        self.assertEqual(media_display_name(""), "")
+
+    def test_falls_back_to_source_url_outside_media_root(self) -> None:
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            self.assertEqual(
+                media_url_from_paths("/elsewhere/1.jpg", " https://cdn.example/1.jpg "),
+                "https://cdn.example/1.jpg",
+            )
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import importlib.util
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from apps.posts.models import Channel, Post
+
+
+@skipUnless(importlib.util.find_spec("cachalot"), "django-cachalot nie jest zainstalowany")
+@override_settings(
+    INSTALLED_APPS=[*settings.INSTALLED_APPS, "cachalot"],
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "cachalot": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "cachalot"},
+    },
+    CACHALOT_ENABLED=True,
+    CACHALOT_CACHE="cachalot",
+    CACHALOT_ONLY_CACHABLE_TABLES=("posts_channel",),
+)
+class ChannelQueryCacheTest(TestCase):
+    def setUp(self) -> None:
+        from cachalot.settings import cachalot_settings
+
+        # Cachalot czyta ustawienia w ready(), zanim override je podmieni.
+        cachalot_settings.reload()
+        self.addCleanup(cachalot_settings.unload)
+        self.channel = Channel.objects.create(
+            name="Kanał", slug="kanal", tg_channel_id="@kanal", draft_ttl_days=5
+        )
+
+    def _ttl_lookup(self) -> int:
+        return Channel.objects.filter(pk=self.channel.pk).values_list("draft_ttl_days", flat=True).first()
+
+    def test_channel_lookup_is_cached(self) -> None:
+        self._ttl_lookup()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._ttl_lookup(), 5)
+
+    def test_channel_edit_invalidates_cached_lookup(self) -> None:
+        self.assertEqual(self._ttl_lookup(), 5)
+
+        self.channel.draft_ttl_days = 1
+        self.channel.save()
+
+        self.assertEqual(self._ttl_lookup(), 1)
+        post = Post.objects.create(channel_id=self.channel.pk, text="Draft", status=Post.Status.DRAFT)
+        self.assertEqual((post.expires_at - post.created_at).days, 0)
@@ -1,8 +1,9 @@
 import json
+import random
 from datetime import timedelta
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
 from apps.posts import services
@@ -210,3 +211,70 @@ class ChannelPromptPropagationTest(TestCase):
         ]
         self.assertEqual(1, len(duplicate_lines))
         self.assertIn("Dodatkowy temat", system_prompt)
+
+    def test_static_channel_rules_follow_channel_edits(self):
+        services._channel_static_rules.cache_clear()
+        first = services._channel_system_prompt(self.channel)
+        services._channel_system_prompt(self.channel)
+        self.assertEqual(services._channel_static_rules.cache_info().hits, 1)
+
+        self.channel.max_chars = 500
+        self.channel.save()
+        second = services._channel_system_prompt(self.channel)
+
+        self.assertIn("maksymalnie 321 znaków", first)
+        self.assertIn("maksymalnie 500 znaków", second)
+
+    def test_similar_texts_are_sorted_by_score(self):
+        scores = services._score_similar_texts(
+            "  Raport   o dronach ",
+            ["Pogoda na weekend", "", "Raport o dronach", "Raport o dronach i czołgach"],
+        )
+
+        self.assertEqual(
+            [original for _, original in scores],
+            ["Raport o dronach", "Raport o dronach i czołgach", "Pogoda na weekend"],
+        )
+        self.assertEqual(scores[0][0], 1.0)
+        self.assertEqual(services._score_similar_texts("   ", ["Raport"]), [])
+
+    def test_recent_post_texts_are_normalised_once(self):
+        Post.objects.create(channel=self.channel, text="  Wpis \n z  odstępami ", status=Post.Status.DRAFT)
+        Post.objects.create(channel=self.channel, text=" \n\t ", status=Post.Status.DRAFT)
+
+        self.assertEqual(services._recent_post_texts(self.channel), ["Wpis z odstępami"])
+
+    def test_select_channel_sources_prefers_weighted_sources(self):
+        heavy = ChannelSource.objects.create(channel=self.channel, name="A", url="https://a.example/", priority=9)
+        light = ChannelSource.objects.create(channel=self.channel, name="B", url="https://b.example/", priority=1)
+        muted = ChannelSource.objects.create(channel=self.channel, name="C", url="https://c.example/", priority=0)
+        rng = random.Random(1234)
+
+        picks = [services._select_channel_sources(self.channel, limit=1, rng=rng)[0] for _ in range(300)]
+
+        self.assertNotIn(muted, picks)
+        self.assertGreater(picks.count(heavy), picks.count(light) * 3)
+        everything = services._select_channel_sources(self.channel, limit=5, rng=rng)
+        self.assertEqual(len(everything), 3)
+        self.assertEqual(everything[-1], muted)
+
+
+class OpenAIRequestLogTest(SimpleTestCase):
+    def test_payload_is_serialised_only_when_info_is_enabled(self):
+        payload = {"input": "treść", "tools": None}
+
+        with patch("apps.posts.services._serialisable_payload") as mock_strip:
+            with self.assertLogs(services.logger, level="WARNING"):
+                services.logger.warning("poziom WARNING")
+                services._log_openai_request("responses.create", payload)
+        mock_strip.assert_not_called()
+
+        with self.assertLogs(services.logger, level="INFO") as logs:
+            services._log_openai_request("responses.create", payload)
+        self.assertIn('"payload":{"input":"treść"}', logs.output[0])
+
+    def test_payload_log_keeps_non_string_keys(self):
+        with self.assertLogs(services.logger, level="INFO") as logs:
+            services._log_openai_request("responses.create", {"metadata": {1: "a"}})
+
+        self.assertIn('"metadata":{"1":"a"}', logs.output[0])
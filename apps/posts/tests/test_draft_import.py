@@ -6,10 +6,12 @@ import json
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 from django.urls import reverse
 
 from apps.posts.admin import DraftImportForm
+from apps.posts.management.commands.generate_draft_prompt import Command
 from apps.posts.models import Channel, Post
 
 
@@ -86,3 +88,14 @@ class GenerateDraftPromptCommandTest(TestCase):
         self.assertIn("System prompt", result)
         self.assertIn("User prompt", result)
         self.assertIn("Wytyczne kanału", result)
+
+    def test_command_resolves_channel_by_slug_or_id(self) -> None:
+        numeric = Channel.objects.create(name="Liczbowy", slug=str(self.channel.id), tg_channel_id="@liczbowy")
+        command = Command()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(command._resolve_channel("sztuka-wojny"), self.channel)
+        self.assertEqual(command._resolve_channel(str(self.channel.id)), self.channel)
+        self.assertEqual(command._resolve_channel(str(numeric.id)), numeric)
+        with self.assertRaisesMessage(CommandError, "slugu 'brak'"):
+            command._resolve_channel("brak")
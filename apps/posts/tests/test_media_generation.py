@@ -4,18 +4,44 @@ from typing import Any
 
 from typing import Any
 
+import base64
 import tempfile
+import threading
 import os
 from unittest import mock
 
 import httpx
 
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 from apps.posts import services
 from apps.posts.models import Channel, Post, PostMedia
 
 
+class _HtmlStream:
+    """Imituje odpowiedź Client.stream zwracającą tekst w małych fragmentach."""
+
+    def __init__(self, text: str, chunk_size: int = 16):
+        self.chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        self.consumed = 0
+
+    def __enter__(self) -> "_HtmlStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> bool:
+        return False
+
+    def raise_for_status(self) -> None:
+        return None
+
+    def iter_text(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
 class MediaHandlingTest(TestCase):
     def setUp(self) -> None:
         super().setUp()
@@ -137,6 +163,25 @@ class MediaHandlingTest(TestCase):
         self.assertEqual(reference.get("tweet_id"), "9876543210987654321")
         self.assertEqual(reference.get("author_username"), "Other")
 
+    def test_normalise_media_payload_drops_placeholder_identifiers(self) -> None:
+        payload = [
+            {
+                "type": "photo",
+                "resolver": "telegram",
+                "reference": {
+                    "tg_post_url": "https://t.me/kanal/5",
+                    "message_id": "MESSAGE_ID",
+                    "chat_id": "tweet_url",
+                },
+            }
+        ]
+
+        with self.assertLogs(services.logger, level="WARNING") as logs:
+            result = services._normalise_media_payload(payload, "unused")
+
+        self.assertEqual(result[0]["reference"], {"tg_post_url": "https://t.me/kanal/5"})
+        self.assertEqual(len(logs.output), 2)
+
     def test_normalise_media_payload_does_not_misclassify_similar_domains(self) -> None:
         payload = [
             {
@@ -244,6 +289,95 @@ class MediaHandlingTest(TestCase):
         )
         mock_cache.assert_called_once_with(media[0])
 
+    def test_attach_media_resolves_items_in_parallel_keeping_order(self) -> None:
+        payload = [
+            {"type": "photo", "resolver": "twitter", "reference": {"tweet_id": "1"}},
+            {"type": "photo", "resolver": "telegram", "reference": {"tg_post_url": "https://t.me/source/7"}},
+            {"type": "photo", "resolver": "twitter", "reference": {"tweet_id": "2"}},
+            {"type": "video", "resolver": "telegram", "reference": {"tg_post_url": "https://t.me/source/7"}},
+        ]
+        # Trzy grupy (dwa tweety i jeden album) muszą dojść do bariery jednocześnie.
+        barrier = threading.Barrier(3, timeout=5)
+        album_calls: list[str] = []
+
+        def _fake_resolve(*, resolver: str, reference: dict, media_type: str, caption: str) -> str:
+            if "tg_post_url" in reference:
+                if not album_calls:
+                    barrier.wait()
+                album_calls.append(media_type)
+                return f"https://cdn.example/album-{media_type}"
+            barrier.wait()
+            return f"https://cdn.example/tweet-{reference['tweet_id']}.jpg"
+
+        with patch("apps.posts.services._resolve_media_reference", side_effect=_fake_resolve), patch(
+            "apps.posts.services.cache_media", return_value="/cache/item"
+        ):
+            services.attach_media_from_payload(self.post, payload)
+
+        self.assertEqual(album_calls, ["photo", "video"])
+        self.assertEqual(
+            list(self.post.media.order_by("order").values_list("source_url", flat=True)),
+            [
+                "https://cdn.example/tweet-1.jpg",
+                "https://cdn.example/album-photo",
+                "https://cdn.example/tweet-2.jpg",
+                "https://cdn.example/album-video",
+            ],
+        )
+
+    def _previous_telegram_media(self, *types: str, channel: Channel | None = None) -> None:
+        earlier = Post.objects.create(channel=channel or self.channel, text="Wcześniej")
+        for order, media_type in enumerate(types):
+            cached = os.path.join(self._tmp_media.name, f"earlier-{order}.jpg")
+            with open(cached, "wb") as fh:
+                fh.write(b"jpg")
+            PostMedia.objects.create(
+                post=earlier,
+                type=media_type,
+                order=order,
+                cache_path=cached,
+                tg_file_id=f"FILE{order}",
+                reference_data={"tg_post_url": "https://t.me/source/5"},
+            )
+
+    def test_attach_media_reuses_previously_fetched_telegram_media(self) -> None:
+        self._previous_telegram_media("photo")
+        payload = [{"type": "photo", "resolver": "telegram", "reference": {"tg_post_url": "https://t.me/source/5"}}]
+
+        with patch("apps.posts.services._resolve_media_reference") as mock_resolve:
+            services.attach_media_from_payload(self.post, payload)
+
+        mock_resolve.assert_not_called()
+        media = self.post.media.get()
+        self.assertEqual(media.tg_file_id, "FILE0")
+        self.assertTrue(media.source_url.startswith("file://"))
+        self.assertTrue(os.path.exists(media.cache_path))
+
+    def test_attach_media_drops_file_id_from_another_bot(self) -> None:
+        self.channel.bot_token = "111:AAA"
+        self.channel.save()
+        other = Channel.objects.create(name="Inny", slug="inny", tg_channel_id="@inny", bot_token="222:BBB")
+        self._previous_telegram_media("photo", channel=other)
+        payload = [{"type": "photo", "resolver": "telegram", "reference": {"tg_post_url": "https://t.me/source/5"}}]
+
+        with patch("apps.posts.services._resolve_media_reference") as mock_resolve:
+            services.attach_media_from_payload(self.post, payload)
+
+        mock_resolve.assert_not_called()
+        media = self.post.media.get()
+        self.assertEqual(media.tg_file_id, "")
+        self.assertTrue(media.source_url.startswith("file://"))
+        self.assertTrue(os.path.exists(media.cache_path))
+
+    def test_attach_media_downloads_album_again_instead_of_reusing_a_part(self) -> None:
+        self._previous_telegram_media("photo", "photo")
+        payload = [{"type": "photo", "resolver": "telegram", "reference": {"tg_post_url": "https://t.me/source/5"}}]
+
+        with patch("apps.posts.services._resolve_media_reference", return_value="") as mock_resolve:
+            services.attach_media_from_payload(self.post, payload)
+
+        mock_resolve.assert_called_once()
+
     def test_attach_media_auto_expands_telegram_album(self) -> None:
         payload = [
             {
@@ -283,6 +417,41 @@ class MediaHandlingTest(TestCase):
         self.assertEqual(len(metadata), 2)
         self.assertTrue(metadata[1].get("auto_album"))
 
+    def test_attach_media_inserts_album_extras_in_one_query(self) -> None:
+        payload = [
+            {
+                "type": "photo",
+                "resolver": "telegram",
+                "reference": {"tg_post_url": "https://t.me/uniannet/109640"},
+            }
+        ]
+
+        def _fake_cache(pm: PostMedia) -> str:
+            return "" if pm.source_url.endswith("broken.jpg") else f"/cache/{pm.id}.bin"
+
+        extras = [
+            {"uri": "file:///tmp/photo2.jpg", "type": "photo"},
+            {"uri": "file:///tmp/broken.jpg", "type": "photo"},
+            {"uri": "file:///tmp/video3.mp4", "type": "video"},
+        ]
+        with patch(
+            "apps.posts.services._resolve_media_reference",
+            return_value="file:///tmp/photo1.jpg",
+        ), patch("apps.posts.services.cache_media", side_effect=_fake_cache), patch(
+            "apps.posts.resolvers.telegram.consume_cached_album",
+            return_value=extras,
+        ), CaptureQueriesContext(connection) as queries:
+            services.attach_media_from_payload(self.post, payload)
+
+        inserts = [q for q in queries.captured_queries if q["sql"].startswith('INSERT INTO "posts_postmedia"')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(
+            list(self.post.media.order_by("order").values_list("source_url", flat=True)),
+            ["file:///tmp/photo1.jpg", "file:///tmp/photo2.jpg", "file:///tmp/video3.mp4"],
+        )
+        statuses = [entry["status"] for entry in self.post.source_metadata["media"]]
+        self.assertEqual(statuses, ["cached", "cached", "skipped", "cached"])
+
     def test_attach_media_skips_auto_expand_when_multiple_entries_present(self) -> None:
         payload = [
             {
@@ -337,6 +506,98 @@ class MediaHandlingTest(TestCase):
 
         self.assertEqual(url, "")
 
+    def test_persist_resolved_media_writes_whole_payload(self) -> None:
+        content = os.urandom(256 * 1024)
+
+        path = services._persist_resolved_media(
+            content=content,
+            media_type="video",
+            resolver="telegram",
+            reference={"tg_post_url": "https://t.me/source/456"},
+            content_type="video/mp4",
+        )
+
+        self.assertTrue(path.endswith(".mp4"))
+        with open(path, "rb") as fh:
+            self.assertEqual(fh.read(), content)
+
+    def test_persist_resolved_base64_decodes_in_chunks(self) -> None:
+        content = os.urandom(100_001)
+        encoded = base64.encodebytes(content).decode()  # z łamaniem linii co 76 znaków
+
+        with patch.object(services, "_BASE64_CHUNK_CHARS", 1000):
+            path = services._persist_resolved_base64(
+                content_b64=encoded,
+                media_type="video",
+                resolver="telegram",
+                reference={},
+                content_type="video/mp4",
+            )
+            with self.assertLogs(services.logger, level="ERROR"):
+                broken = services._persist_resolved_base64(
+                    content_b64=encoded.strip()[:-1],
+                    media_type="video",
+                    resolver="telegram",
+                    reference={},
+                )
+
+        with open(path, "rb") as fh:
+            self.assertEqual(fh.read(), content)
+        self.assertEqual(broken, "")
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+    def test_shared_http_client_is_built_once_and_rejects_cookies(self) -> None:
+        barrier = threading.Barrier(4, timeout=5)
+        clients: list[httpx.Client] = []
+
+        def _first_call() -> None:
+            barrier.wait()
+            clients.append(services._http_client())
+
+        with patch.object(services, "_HTTP_CLIENT", None):
+            threads = [threading.Thread(target=_first_call) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            client = services._http_client()
+            response = httpx.Response(
+                200,
+                headers={"set-cookie": "session=abc; Path=/"},
+                request=httpx.Request("GET", "https://x.com/user/status/1"),
+            )
+            client.cookies.extract_cookies(response)
+            client.close()
+
+        self.assertEqual(len(clients), 4)
+        self.assertTrue(all(item is client for item in clients))
+        self.assertEqual(len(client.cookies), 0)
+
+    def test_resolve_media_reference_posts_through_shared_client(self) -> None:
+        class _Resp:
+            headers = {"content-type": "image/jpeg"}
+            content = b"jpeg-bytes"
+
+            def raise_for_status(self) -> None:
+                return None
+
+        with mock.patch.dict(
+            os.environ, {"MEDIA_RESOLVER_URL": "https://resolver.example/", "MEDIA_RESOLVER_TIMEOUT": "5"}
+        ), patch.object(services._http_client(), "post", return_value=_Resp()) as mock_post:
+            path = services._resolve_media_reference(
+                resolver="telegram",
+                reference={"tg_post_url": "https://t.me/source/456"},
+                media_type="photo",
+            )
+
+        mock_post.assert_called_once_with(
+            "https://resolver.example/resolve/telegram",
+            json={"media_type": "photo", "caption": "", "tg_post_url": "https://t.me/source/456"},
+            timeout=5.0,
+        )
+        with open(path, "rb") as fh:
+            self.assertEqual(fh.read(), b"jpeg-bytes")
+
     def test_resolve_media_reference_uses_twitter_html_fallback(self) -> None:
         html_doc = """
         <html>
@@ -347,19 +608,12 @@ class MediaHandlingTest(TestCase):
         </html>
         """
 
-        class _HtmlResponse:
-            def __init__(self, text: str):
-                self.text = text
-
-            def raise_for_status(self) -> None:
-                return None
-
         tweet_url = "https://x.com/user/status/1234567890"
         reference = {"tweet_url": tweet_url, "tweet_id": "1234567890"}
 
-        with mock.patch.dict(os.environ, {"MEDIA_RESOLVER_URL": ""}), patch(
-            "apps.posts.services.httpx.get", return_value=_HtmlResponse(html_doc)
-        ) as mock_get:
+        with mock.patch.dict(os.environ, {"MEDIA_RESOLVER_URL": ""}), patch.object(
+            services._http_client(), "stream", return_value=_HtmlStream(html_doc)
+        ) as mock_stream:
             resolved = services._resolve_media_reference(
                 resolver="telegram",
                 reference=reference,
@@ -368,9 +622,9 @@ class MediaHandlingTest(TestCase):
             )
 
         self.assertEqual(resolved, "https://pbs.twimg.com/media/test123.jpg?name=large")
-        mock_get.assert_called_once()
-        args, kwargs = mock_get.call_args
-        self.assertEqual(args[0], tweet_url)
+        mock_stream.assert_called_once()
+        args, kwargs = mock_stream.call_args
+        self.assertEqual(args, ("GET", tweet_url))
         self.assertTrue(kwargs.get("follow_redirects"))
         self.assertIn("headers", kwargs)
         self.assertIn("User-Agent", kwargs["headers"])
@@ -399,7 +653,11 @@ class MediaHandlingTest(TestCase):
             calls.append(url)
             if "twstalker" in url:
                 return _HtmlResponse(twstalker_html)
-            return _HtmlResponse("<html><head></head><body></body></html>")
+            raise AssertionError(f"Nieoczekiwany URL {url}")
+
+        def _fake_stream(method: str, url: str, **kwargs: Any) -> _HtmlStream:
+            calls.append(url)
+            return _HtmlStream("<html><head></head><body></body></html>")
 
         reference = {
             "tweet_url": tweet_url,
@@ -407,9 +665,9 @@ class MediaHandlingTest(TestCase):
             "author_username": "Gerashchenko_en",
         }
 
-        with mock.patch.dict(os.environ, {"MEDIA_RESOLVER_URL": ""}), patch(
-            "apps.posts.services.httpx.get", side_effect=_fake_get
-        ):
+        with mock.patch.dict(os.environ, {"MEDIA_RESOLVER_URL": ""}), patch.object(
+            services._http_client(), "get", side_effect=_fake_get
+        ), patch.object(services._http_client(), "stream", side_effect=_fake_stream):
             resolved = services._resolve_media_reference(
                 resolver="twitter",
                 reference=reference,
@@ -444,10 +702,12 @@ class MediaHandlingTest(TestCase):
 
         calls: list[str] = []
 
+        def _fake_stream(method: str, url: str, **kwargs: Any) -> _HtmlStream:
+            calls.append(url)
+            return _HtmlStream("<html><head></head><body></body></html>")
+
         def _fake_get(url: str, *args: Any, **kwargs: Any):
             calls.append(url)
-            if url == tweet_url:
-                return _HtmlResponse("<html><head></head><body></body></html>")
             if "twstalker" in url:
                 request = httpx.Request("GET", url)
                 response = httpx.Response(403, request=request)
@@ -462,9 +722,9 @@ class MediaHandlingTest(TestCase):
             "author_username": "Gerashchenko_en",
         }
 
-        with mock.patch.dict(os.environ, {"MEDIA_RESOLVER_URL": ""}), patch(
-            "apps.posts.services.httpx.get", side_effect=_fake_get
-        ):
+        with mock.patch.dict(os.environ, {"MEDIA_RESOLVER_URL": ""}), patch.object(
+            services._http_client(), "get", side_effect=_fake_get
+        ), patch.object(services._http_client(), "stream", side_effect=_fake_stream):
             resolved = services._resolve_media_reference(
                 resolver="twitter",
                 reference=reference,
@@ -478,6 +738,140 @@ class MediaHandlingTest(TestCase):
         self.assertTrue(calls[1].startswith("https://www.twstalker.com/"))
         self.assertTrue(calls[2].startswith("https://r.jina.ai/"))
 
+    def test_twitter_html_fallback_stops_reading_after_head(self) -> None:
+        html_doc = (
+            '<html><head><meta property="og:image" content="https://pbs.twimg.com/media/x.jpg">'
+            "</head><body>" + "x" * 400 + "</body></html>"
+        )
+        stream = _HtmlStream(html_doc)
+
+        with patch.object(services._http_client(), "stream", return_value=stream):
+            resolved = services._resolve_media_via_twitter_html("https://x.com/u/status/123456", "photo")
+
+        self.assertEqual(resolved, "https://pbs.twimg.com/media/x.jpg")
+        self.assertLess(stream.consumed, len(stream.chunks) // 2)
+
+    def test_first_url_from_skips_blank_urls_and_descends_into_nested_data(self) -> None:
+        payload = {
+            "url": "   ",
+            "data": [{"image_url": ""}, {"variants": [{"href": "  https://cdn.example/a.mp4 "}]}],
+        }
+
+        self.assertEqual(services._first_url_from(payload), "https://cdn.example/a.mp4")
+        self.assertEqual(services._first_url_from({"url": " \n"}), "")
+
+    def test_detect_media_type_uses_mime_before_extension(self) -> None:
+        self.assertEqual(services._detect_media_type(".bin", "application/pdf; charset=binary"), "doc")
+        self.assertEqual(services._detect_media_type(".jpg", "video/mp4"), "video")
+        self.assertEqual(services._detect_media_type(".JPG", None), "photo")
+        self.assertEqual(services._guess_extension("video", None), ".mp4")
+
+    def test_looks_like_asset_is_memoised(self) -> None:
+        services._looks_like_asset.cache_clear()
+        url = "https://pbs.twimg.com/media/a.JPG?name=large"
+
+        self.assertTrue(services._looks_like_asset(url))
+        self.assertTrue(services._looks_like_asset(url))
+        self.assertFalse(services._looks_like_asset("ftp://example.com/a.jpg"))
+        self.assertEqual(services._looks_like_asset.cache_info().hits, 1)
+
+    def test_extract_meta_tags_reads_head_only(self) -> None:
+        html = (
+            "<html><HEAD>"
+            "<meta content='https://pbs.twimg.com/media/a.jpg?x=1&amp;name=large' property='OG:IMAGE'>"
+            '<meta name="og:video" content="https://video.twimg.com/v.mp4"/>'
+            '<meta property="og:title" content="Tytuł">'
+            "</head><body>"
+            '<meta property="og:image" content="https://example.com/body.jpg">'
+            "</body></html>"
+        )
+
+        meta = services._extract_meta_tags(html, ["og:image", "og:video"])
+
+        self.assertEqual(
+            meta,
+            {
+                "og:image": ["https://pbs.twimg.com/media/a.jpg?x=1&amp;name=large"],
+                "og:video": ["https://video.twimg.com/v.mp4"],
+            },
+        )
+
+    def test_html_fallback_skips_twimg_scan_without_twimg_host(self) -> None:
+        html = "<html><head><title>x</title></head><body>Brak mediów</body></html>"
+
+        with patch("apps.posts.services._extract_twimg_candidates") as mock_scan:
+            resolved = services._extract_twitter_media_from_html(html, "photo")
+
+        self.assertEqual(resolved, "")
+        mock_scan.assert_not_called()
+
+    def test_html_fallback_finds_mixed_case_twimg_host(self) -> None:
+        html = '<body><img src="https://pbs.TWIMG.com/media/abc.jpg?name=large"></body>'
+
+        resolved = services._extract_twitter_media_from_html(html, "photo")
+
+        self.assertEqual(resolved, "https://pbs.TWIMG.com/media/abc.jpg?name=large")
+
+    def test_extract_twimg_candidates_dedupes_in_order(self) -> None:
+        html = (
+            '<img src="https://pbs.twimg.com/media/b.jpg?name=small&amp;format=jpg">'
+            '<img src="https://pbs.twimg.com/media/a.jpg">'
+            '<img src="https://pbs.twimg.com/media/b.jpg?name=small&format=jpg">'
+        )
+
+        self.assertEqual(
+            services._extract_twimg_candidates(html),
+            [
+                "https://pbs.twimg.com/media/b.jpg?name=small&format=jpg",
+                "https://pbs.twimg.com/media/a.jpg",
+            ],
+        )
+
+    def test_prefer_photo_url_picks_largest_named_variant(self) -> None:
+        urls = [
+            "https://pbs.twimg.com/profile_images/1/avatar.jpg?name=orig",
+            "https://pbs.twimg.com/media/abc.jpg?name=small",
+            "https://pbs.twimg.com/media/abc.jpg?format=jpg&name=ORIG",
+            "https://pbs.twimg.com/media/abc.jpg",
+        ]
+
+        self.assertEqual(
+            services._prefer_photo_url(urls),
+            "https://pbs.twimg.com/media/abc.jpg?format=jpg&name=ORIG",
+        )
+
+    def test_prefer_video_url_picks_highest_resolution(self) -> None:
+        urls = [
+            "https://video.twimg.com/ext_tw_video/1/pu/vid/avc1/640x360/a.mp4",
+            "https://video.twimg.com/ext_tw_video/1/pu/vid/avc1/1280x720/a.mp4",
+            "https://video.twimg.com/ext_tw_video_thumb/1/pu/img/thumb.jpg",
+        ]
+
+        self.assertEqual(
+            services._prefer_video_url(urls),
+            "https://video.twimg.com/ext_tw_video/1/pu/vid/avc1/1280x720/a.mp4",
+        )
+
+    def test_prefer_url_falls_back_to_untagged_candidates(self) -> None:
+        self.assertEqual(
+            services._prefer_photo_url(
+                [
+                    "https://pbs.twimg.com/semantic_core_img/1/x.jpg",
+                    "https://pbs.twimg.com/card_img/1/x.jpg",
+                ]
+            ),
+            "https://pbs.twimg.com/card_img/1/x.jpg",
+        )
+        self.assertEqual(
+            services._prefer_video_url(
+                [
+                    "https://pbs.twimg.com/tweet_video_thumb/1.jpg",
+                    "https://pbs.twimg.com/EXT_TW_VIDEO_THUMB/1/pu/img/x.jpg",
+                ]
+            ),
+            "https://pbs.twimg.com/EXT_TW_VIDEO_THUMB/1/pu/img/x.jpg",
+        )
+
     def test_attach_media_removes_when_download_fails(self) -> None:
         payload = [
             {"type": "photo", "source_url": "https://example.com/new.jpg"},
@@ -509,7 +903,7 @@ class MediaHandlingTest(TestCase):
             def raise_for_status(self) -> None:
                 return None
 
-        with patch("apps.posts.services.httpx.get", return_value=_Resp(fake_bytes)) as mock_get:
+        with patch.object(services._http_client(), "get", return_value=_Resp(fake_bytes)) as mock_get:
             path = services.cache_media(pm)
 
         mock_get.assert_called_once_with("https://example.com/img.png", timeout=30.0, follow_redirects=True)
@@ -536,7 +930,7 @@ class MediaHandlingTest(TestCase):
             def raise_for_status(self) -> None:
                 return None
 
-        with patch("apps.posts.services.httpx.get", return_value=_Resp(fake_bytes)):
+        with patch.object(services._http_client(), "get", return_value=_Resp(fake_bytes)):
             path = services.cache_media(pm)
 
         self.assertTrue(path.endswith(".mp4"))
@@ -544,6 +938,35 @@ class MediaHandlingTest(TestCase):
         self.assertEqual(pm.type, "video")
         self.assertEqual(pm.reference_data.get("detected_type"), "video")
 
+    def _local_media(self) -> tuple[str, PostMedia]:
+        src = os.path.join(self._tmp_media.name, "telegram", "clip.mp4")
+        os.makedirs(os.path.dirname(src))
+        with open(src, "wb") as fh:
+            fh.write(b"local-video")
+        pm = PostMedia.objects.create(post=self.post, type="photo", source_url=f"file://{src}")
+        return src, pm
+
+    def test_cache_media_links_local_file_without_reading_it(self) -> None:
+        src, pm = self._local_media()
+
+        path = services.cache_media(pm)
+
+        self.assertTrue(path.endswith(f"{pm.id}.mp4"))
+        self.assertTrue(os.path.samefile(path, src))
+        self.assertTrue(os.path.exists(src))
+        pm.refresh_from_db()
+        self.assertEqual(pm.type, "video")
+
+    def test_cache_media_copies_local_file_across_filesystems(self) -> None:
+        src, pm = self._local_media()
+
+        with patch("apps.posts.services.os.link", side_effect=OSError(18, "Invalid cross-device link")):
+            path = services.cache_media(pm)
+
+        self.assertFalse(os.path.samefile(path, src))
+        with open(path, "rb") as fh:
+            self.assertEqual(fh.read(), b"local-video")
+
 
 class ArticleSourceMetadataTest(TestCase):
     def setUp(self) -> None:
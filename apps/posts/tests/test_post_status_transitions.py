@@ -32,3 +32,24 @@ class PostStatusTransitionsTest(TestCase):
 
         post.refresh_from_db()
         self.assertEqual(post.status, Post.Status.APPROVED)
+
+    def test_draft_expiry_reads_only_channel_ttl(self):
+        self.channel.draft_ttl_days = 5
+        self.channel.save()
+
+        with self.assertNumQueries(2):
+            post = Post.objects.create(channel_id=self.channel.id, text="Drugi", status=Post.Status.DRAFT)
+
+        self.assertAlmostEqual(
+            (post.expires_at - timezone.now()).total_seconds(),
+            timezone.timedelta(days=5).total_seconds(),
+            delta=60,
+        )
+
+    def test_bulk_channel_update_changes_draft_ttl(self):
+        Post.objects.create(channel_id=self.channel.id, text="Pierwszy", status=Post.Status.DRAFT)
+        Channel.objects.filter(pk=self.channel.pk).update(draft_ttl_days=1)
+
+        post = Post.objects.create(channel_id=self.channel.id, text="Drugi", status=Post.Status.DRAFT)
+
+        self.assertLess(post.expires_at, timezone.now() + timezone.timedelta(days=2))
@@ -4,6 +4,7 @@ from unittest.mock import patch
 
 from django.test import TestCase
 
+from apps.posts.drafts import iter_missing_draft_requirements
 from apps.posts.models import Channel, Post
 from apps.posts.tasks import task_gpt_generate_for_channel
 
@@ -41,3 +42,24 @@ class GenerateDraftsTaskTest(TestCase):
             self.channel.draft_target_count,
         )
 
+
+
+class MissingDraftRequirementsTest(TestCase):
+    def setUp(self) -> None:
+        self.full = Channel.objects.create(
+            name="Pełny", slug="pelny", tg_channel_id="@pelny", draft_target_count=1
+        )
+        self.empty = Channel.objects.create(
+            name="Pusty", slug="pusty", tg_channel_id="@pusty", draft_target_count=4
+        )
+        Post.objects.create(channel=self.full, text="Draft", status=Post.Status.DRAFT)
+
+    def test_accepts_channel_queryset_in_single_query(self) -> None:
+        channels = Channel.objects.filter(slug__in=["pelny", "pusty"])
+        with self.assertNumQueries(1):
+            missing = list(iter_missing_draft_requirements(channels))
+        self.assertEqual(missing, [(self.empty.id, 4)])
+
+    def test_empty_iterable_yields_nothing(self) -> None:
+        with self.assertNumQueries(0):
+            self.assertEqual(list(iter_missing_draft_requirements([])), [])
@@ -0,0 +1,518 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import redis
+from aiolimiter import AsyncLimiter
+from django.test import SimpleTestCase, override_settings
+from telethon.errors import FloodWaitError
+
+from apps.posts.resolvers import telegram
+
+
+class FakeTelegramClient:
+    instances: list["FakeTelegramClient"] = []
+
+    def __init__(self, media_dir: Path) -> None:
+        self.media_dir = media_dir
+        self.connected = False
+        self.connect_calls = 0
+        self.entity_calls: list[str] = []
+        FakeTelegramClient.instances.append(self)
+
+    async def connect(self) -> None:
+        self.connect_calls += 1
+        self.connected = True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def disconnect(self) -> None:
+        self.connected = False
+
+    async def get_entity(self, chat):
+        self.entity_calls.append(chat)
+        return chat
+
+    async def get_messages(self, entity, ids):
+        return SimpleNamespace(id=ids, media=True, grouped_id=None, photo=True)
+
+    async def download_media(self, item, file):
+        path = Path(file) / f"{item.id}.jpg"
+        path.write_bytes(b"jpg")
+        return str(path)
+
+
+RESOLVER_ENV = {
+    "TELEGRAM_RESOLVER_API_ID": "1",
+    "TELEGRAM_RESOLVER_API_HASH": "hash",
+    "TELEGRAM_RESOLVER_SESSION": "session",
+}
+
+
+class SharedClientTest(SimpleTestCase):
+    def setUp(self) -> None:
+        FakeTelegramClient.instances = []
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        self.addCleanup(self._drop_client)
+        # Each test sets its own resolver environment.
+        telegram._resolver_config.cache_clear()
+        self.addCleanup(telegram._resolver_config.cache_clear)
+        telegram._resolved_media_dir_for.cache_clear()
+
+    def _drop_client(self) -> None:
+        asyncio.run_coroutine_threadsafe(telegram._drop_shared_client(), telegram._resolver_loop()).result()
+
+    def _build_client(self, *args) -> FakeTelegramClient:
+        return FakeTelegramClient(Path(self.media_root.name))
+
+    def _download(self, url: str) -> str:
+        return telegram.download_telegram_media(url, media_type="photo", caption="")
+
+    def test_reuses_connected_client_between_downloads(self) -> None:
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=self._build_client
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            first = self._download("https://t.me/kanal/10")
+            second = self._download("https://t.me/kanal/11")
+
+        self.assertTrue(first.endswith("/10.jpg"))
+        self.assertTrue(second.endswith("/11.jpg"))
+        self.assertEqual(len(FakeTelegramClient.instances), 1)
+        self.assertEqual(FakeTelegramClient.instances[0].connect_calls, 1)
+        self.assertEqual(FakeTelegramClient.instances[0].entity_calls, ["kanal"])
+        self.assertEqual(telegram._resolver_config.cache_info().misses, 1)
+
+    def test_reconnects_after_connection_loss(self) -> None:
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=self._build_client
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            self._download("https://t.me/kanal/10")
+            FakeTelegramClient.instances[0].connected = False
+            self._download("https://t.me/kanal/11")
+
+        self.assertEqual(len(FakeTelegramClient.instances), 2)
+        # Peers resolved by the lost session are not reused by the new one.
+        self.assertEqual(FakeTelegramClient.instances[1].entity_calls, ["kanal"])
+
+    def test_keeps_shared_client_after_non_connection_error(self) -> None:
+        class FailingClient(FakeTelegramClient):
+            async def get_messages(self, entity, ids):
+                if ids == 11:
+                    raise OSError(28, "No space left on device")
+                if ids == 12:
+                    raise ConnectionError("reset")
+                return await super().get_messages(entity, ids)
+
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=lambda *args: FailingClient(Path(self.media_root.name))
+        ), override_settings(MEDIA_ROOT=self.media_root.name), self.assertLogs(telegram.logger, "ERROR"):
+            self._download("https://t.me/kanal/10")
+            self.assertEqual(self._download("https://t.me/kanal/11"), "")
+            self._download("https://t.me/kanal/10")
+            self.assertEqual(len(FakeTelegramClient.instances), 1)
+            self.assertEqual(self._download("https://t.me/kanal/12"), "")
+            self._download("https://t.me/kanal/10")
+
+        self.assertEqual(len(FakeTelegramClient.instances), 2)
+
+    def test_async_api_can_be_gathered_from_another_loop(self) -> None:
+        async def download_many():
+            return await asyncio.gather(
+                telegram.download_telegram_media_async(
+                    "https://t.me/kanal/10", media_type="photo", caption=""
+                ),
+                telegram.download_telegram_media_async(
+                    "https://t.me/kanal/11", media_type="photo", caption=""
+                ),
+            )
+
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=self._build_client
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            first, second = asyncio.run(download_many())
+
+        self.assertTrue(first.endswith("/10.jpg"))
+        self.assertTrue(second.endswith("/11.jpg"))
+        self.assertEqual(len(FakeTelegramClient.instances), 1)
+
+    def test_concurrent_requests_for_one_album_download_it_once(self) -> None:
+        downloads = []
+
+        class AlbumTelegramClient(FakeTelegramClient):
+            album = {
+                10: SimpleNamespace(id=10, media=True, grouped_id=7, photo=True),
+                11: SimpleNamespace(id=11, media=True, grouped_id=7, photo=None, video=True),
+            }
+
+            async def get_messages(self, entity, ids):
+                if isinstance(ids, int):
+                    return self.album[ids]
+                return [self.album.get(msg_id) for msg_id in ids]
+
+            async def download_media(self, item, file):
+                downloads.append(item.id)
+                await asyncio.sleep(0.01)
+                return await super().download_media(item, file)
+
+        async def download_both():
+            return await asyncio.gather(
+                telegram.download_telegram_media_async("https://t.me/kanal/10", media_type="photo", caption=""),
+                telegram.download_telegram_media_async("https://t.me/kanal/11", media_type="video", caption=""),
+            )
+
+        self.addCleanup(telegram._ALBUM_CACHE.clear)
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=lambda *args: AlbumTelegramClient(Path(self.media_root.name))
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            photo, video = asyncio.run(download_both())
+
+        self.assertTrue(photo.endswith("/10.jpg"))
+        self.assertTrue(video.endswith("/11.jpg"))
+        self.assertEqual(sorted(downloads), [10, 11])
+        self.assertEqual(telegram._INFLIGHT, {})
+
+    def test_creates_download_directory_once(self) -> None:
+        with override_settings(MEDIA_ROOT=self.media_root.name), mock.patch.object(
+            telegram, "_READY_DIRS", set()
+        ), mock.patch.object(Path, "mkdir", autospec=True) as mkdir_mock:
+            first = telegram._resolved_media_dir()
+            second = telegram._resolved_media_dir()
+
+        self.assertEqual(first, second)
+        self.assertEqual(mkdir_mock.call_count, 1)
+
+    def test_download_directory_follows_media_root(self) -> None:
+        with tempfile.TemporaryDirectory() as other_root:
+            with override_settings(MEDIA_ROOT=self.media_root.name):
+                first = telegram._resolved_media_dir()
+            with override_settings(MEDIA_ROOT=other_root):
+                second = telegram._resolved_media_dir()
+
+            self.assertEqual(first, Path(self.media_root.name) / "resolved" / "telegram")
+            self.assertEqual(second, Path(other_root) / "resolved" / "telegram")
+            self.assertTrue(second.is_dir())
+
+    def test_shutdown_hook_disconnects_shared_client(self) -> None:
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=self._build_client
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            self._download("https://t.me/kanal/10")
+
+        telegram._shutdown_shared_client()
+
+        self.assertFalse(FakeTelegramClient.instances[0].connected)
+        self.assertIsNone(telegram._CLIENT)
+
+    def test_logs_disconnect_that_does_not_finish(self) -> None:
+        class HangingTelegramClient(FakeTelegramClient):
+            async def disconnect(self) -> None:
+                await asyncio.sleep(5)
+
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=lambda *args: HangingTelegramClient(Path(self.media_root.name))
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            self._download("https://t.me/kanal/10")
+
+        with mock.patch.object(telegram, "_DISCONNECT_TIMEOUT", 0.05), self.assertLogs(
+            telegram.logger, level="WARNING"
+        ) as logs:
+            self._drop_client()
+
+        self.assertIn("rozłączyć", logs.output[0])
+        self.assertIsNone(telegram._CLIENT)
+
+    def test_gives_up_after_resolver_timeout(self) -> None:
+        class SlowTelegramClient(FakeTelegramClient):
+            async def download_media(self, item, file):
+                await asyncio.sleep(5)
+
+        env = {**RESOLVER_ENV, "TELEGRAM_RESOLVER_TIMEOUT": "0.05"}
+        with mock.patch.dict(os.environ, env), mock.patch.object(
+            telegram, "_build_client", side_effect=lambda *args: SlowTelegramClient(Path(self.media_root.name))
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            result = self._download("https://t.me/kanal/10")
+
+        self.assertEqual(result, "")
+        # Let the loop process the cancellation before checking the cleanup.
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), telegram._resolver_loop()).result()
+        self.assertEqual(telegram._INFLIGHT, {})
+
+    def test_downloads_many_links_with_one_fetch_per_chat(self) -> None:
+        fetches = []
+
+        class BatchTelegramClient(FakeTelegramClient):
+            async def get_messages(self, entity, ids):
+                fetches.append((entity, ids))
+                return [
+                    SimpleNamespace(id=msg_id, media=msg_id != 12, grouped_id=None, photo=True)
+                    for msg_id in ids
+                ]
+
+        urls = ["https://t.me/kanal/10", "https://t.me/inny/11", "https://t.me/kanal/12", "zly-link"]
+        with mock.patch.dict(os.environ, RESOLVER_ENV), mock.patch.object(
+            telegram, "_build_client", side_effect=lambda *args: BatchTelegramClient(Path(self.media_root.name))
+        ), override_settings(MEDIA_ROOT=self.media_root.name):
+            results = telegram.download_telegram_media_many(urls, media_type="photo")
+
+        self.assertTrue(results[0].endswith("/10.jpg"))
+        self.assertTrue(results[1].endswith("/11.jpg"))
+        self.assertEqual(results[2:], ["", ""])
+        self.assertEqual(fetches, [("kanal", [10, 12]), ("inny", [11])])
+
+
+def use_fresh_rpc_limiters(test: SimpleTestCase) -> telegram._AIMDLimiter:
+    """Give a test that runs its own event loop limiters not bound to another loop."""
+
+    limiter = telegram._AIMDLimiter(telegram._ALBUM_DOWNLOAD_CONCURRENCY)
+    for name, value in (("_RPC_CONCURRENCY", limiter), ("_RPC_RATE_LIMITER", AsyncLimiter(1000, 1))):
+        patcher = mock.patch.object(telegram, name, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return limiter
+
+
+class AlbumDownloadTest(SimpleTestCase):
+    def setUp(self) -> None:
+        use_fresh_rpc_limiters(self)
+
+    def test_downloads_album_parts_concurrently_in_order(self) -> None:
+        active = 0
+        peak = 0
+
+        class AlbumClient:
+            async def get_messages(self, entity, ids):
+                return [
+                    SimpleNamespace(id=msg_id, media=True, grouped_id=7, photo=True)
+                    for msg_id in ids
+                    if 10 <= msg_id < 16
+                ]
+
+            async def download_media(self, item, file):
+                nonlocal active, peak
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01 * (16 - item.id))
+                active -= 1
+                if item.id == 12:
+                    raise ConnectionError("reset")
+                return f"{file}/{item.id}.jpg"
+
+        message = SimpleNamespace(id=10, media=True, grouped_id=7, photo=True)
+        entries = asyncio.run(
+            telegram._download_album_entries(AlbumClient(), "kanal", message, Path("/tmp/album"))
+        )
+
+        self.assertEqual(
+            [entry["uri"] for entry in entries],
+            [f"file:///tmp/album/{msg_id}.jpg" for msg_id in (10, 11, 13, 14, 15)],
+        )
+        self.assertEqual(peak, telegram._ALBUM_DOWNLOAD_CONCURRENCY)
+
+
+    def test_probes_only_ids_an_album_can_span(self) -> None:
+        requested = []
+
+        class AlbumClient:
+            async def get_messages(self, entity, ids):
+                requested.extend(ids)
+                return [SimpleNamespace(id=msg_id, media=True, grouped_id=7) for msg_id in ids if 18 <= msg_id < 28]
+
+        message = SimpleNamespace(id=20, media=True, grouped_id=7)
+        album = asyncio.run(telegram._collect_album_messages(AlbumClient(), "kanal", message))
+
+        self.assertEqual(requested, list(range(11, 30)))
+        self.assertEqual([item.id for item in album], list(range(18, 28)))
+
+    def test_streams_documents_to_disk(self) -> None:
+        requested_sizes = []
+
+        class StreamingClient:
+            async def iter_download(self, media, request_size):
+                requested_sizes.append(request_size)
+                for chunk in (b"abc", b"def"):
+                    yield chunk
+
+        item = SimpleNamespace(
+            id=10,
+            chat_id=-100123,
+            media="media",
+            document=SimpleNamespace(mime_type="video/mp4"),
+            file=SimpleNamespace(ext=".mp4"),
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = asyncio.run(telegram._download_streaming(StreamingClient(), item, Path(tmp)))
+
+            self.assertEqual(Path(path).name, "tg_100123_10.mp4")
+            self.assertEqual(Path(path).read_bytes(), b"abcdef")
+            self.assertEqual(os.listdir(tmp), ["tg_100123_10.mp4"])
+        self.assertEqual(requested_sizes, [telegram._STREAM_REQUEST_SIZE])
+
+    def test_stream_chunks_go_through_rpc_limiter(self) -> None:
+        class ChunkIter:
+            def __init__(self) -> None:
+                self.chunks = [b"abc", b"def"]
+                self.flooded = False
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                if not self.chunks:
+                    raise StopAsyncIteration
+                if len(self.chunks) == 1 and not self.flooded:
+                    self.flooded = True
+                    raise FloodWaitError(request=None, capture=1)
+                return self.chunks.pop(0)
+
+        class StreamingClient:
+            def iter_download(self, media, request_size):
+                return ChunkIter()
+
+        item = SimpleNamespace(id=11, chat_id=None, media="media", file=SimpleNamespace(ext=".mp4"))
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(
+            telegram.asyncio, "sleep", mock.AsyncMock()
+        ) as sleep_mock, mock.patch.object(telegram, "_rpc", wraps=telegram._rpc) as rpc_mock:
+            path = asyncio.run(telegram._download_streaming(StreamingClient(), item, Path(tmp)))
+
+            self.assertEqual(Path(path).read_bytes(), b"abcdef")
+        # Dwa fragmenty i koniec strumienia; FLOOD_WAIT ponowiony wewnątrz _rpc.
+        self.assertEqual(rpc_mock.call_count, 3)
+        sleep_mock.assert_awaited_once_with(1.1)
+        self.assertLess(telegram._RPC_CONCURRENCY.cap, telegram._ALBUM_DOWNLOAD_CONCURRENCY)
+
+class AlbumCacheTest(SimpleTestCase):
+    def setUp(self) -> None:
+        telegram._ALBUM_CACHE.clear()
+        self.addCleanup(telegram._ALBUM_CACHE.clear)
+
+    @staticmethod
+    def _entries(*types: str) -> list[dict[str, str]]:
+        return [{"uri": f"file:///tmp/{index}", "type": kind} for index, kind in enumerate(types)]
+
+    def test_hands_out_entries_by_type_and_forgets_empty_albums(self) -> None:
+        telegram._store_album_entries(("kanal", 7), "kanal/10", self._entries("photo", "video"))
+
+        self.assertEqual(telegram._take_cached_album_entry(("kanal", 7), "video"), "file:///tmp/1")
+        self.assertEqual(telegram._take_cached_album_entry(("kanal", 7), "video"), "file:///tmp/0")
+        self.assertIsNone(telegram._take_cached_album_entry(("kanal", 7), "photo"))
+
+    def test_evicts_least_recently_used_album(self) -> None:
+        with mock.patch.object(telegram, "_ALBUM_CACHE_LIMIT", 2):
+            telegram._store_album_entries(("kanal", 1), "kanal/1", self._entries("photo", "photo"))
+            telegram._store_album_entries(("kanal", 2), "kanal/2", self._entries("photo", "photo"))
+            telegram._take_cached_album_entry(("kanal", 1), "photo")
+            telegram._store_album_entries(("kanal", 3), "kanal/3", self._entries("photo"))
+
+        self.assertEqual(list(telegram._ALBUM_CACHE), [("kanal", 1), ("kanal", 3)])
+
+    def test_consume_returns_remaining_entries_for_first_url(self) -> None:
+        telegram._store_album_entries(("kanal", 7), "kanal/10", self._entries("photo", "video"))
+
+        self.assertEqual(telegram.consume_cached_album("https://t.me/kanal/11"), [])
+        self.assertEqual(
+            telegram.consume_cached_album("https://t.me/kanal/10"),
+            self._entries("photo", "video"),
+        )
+        self.assertEqual(telegram.consume_cached_album("https://t.me/kanal/10"), [])
+
+
+    def test_falls_back_to_process_cache_when_redis_is_down(self) -> None:
+        client = mock.Mock()
+        client.pipeline.return_value.execute.side_effect = redis.ConnectionError("down")
+        take = mock.Mock(side_effect=redis.ConnectionError("down"))
+
+        with mock.patch.object(telegram, "_album_redis", return_value=client), mock.patch.object(
+            telegram, "_ALBUM_REDIS_TAKE", take
+        ):
+            telegram._store_album_entries(("kanal", 7), "kanal/10", self._entries("photo"))
+            uri = telegram._take_cached_album_entry(("kanal", 7), "photo")
+
+        self.assertEqual(uri, "file:///tmp/0")
+        take.assert_called_once_with(keys=["tg:album:kanal:7"], args=["photo"])
+
+class ParseTelegramUrlTest(SimpleTestCase):
+    def test_parses_message_links(self) -> None:
+        cases = {
+            "https://t.me/kanal/10": ("kanal", 10),
+            "http://t.me/s/kanal/11": ("kanal", 11),
+            "t.me/kanal/12?single": ("kanal", 12),
+            "https://telegram.me/kanal/13/": ("kanal", 13),
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(telegram._parse_telegram_url(url), expected)
+
+    def test_rejects_links_without_message_id(self) -> None:
+        for url in ("https://t.me/kanal", "https://t.me/kanal/wpis", "https://example.com/kanal/10"):
+            with self.subTest(url=url):
+                self.assertEqual(telegram._parse_telegram_url(url), (None, None))
+
+
+class RpcLimiterTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.limiter = use_fresh_rpc_limiters(self)
+
+    def test_waits_out_short_flood_wait_and_shrinks_concurrency(self) -> None:
+        calls = []
+
+        async def call(value):
+            calls.append(value)
+            if len(calls) == 1:
+                raise FloodWaitError(request=None, capture=1)
+            return value
+
+        with mock.patch.object(telegram.asyncio, "sleep", mock.AsyncMock()) as sleep_mock:
+            result = asyncio.run(telegram._rpc(call, "ok"))
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(calls, ["ok", "ok"])
+        sleep_mock.assert_awaited_once_with(1.1)
+        self.assertLess(self.limiter.cap, 4)
+
+    def test_long_flood_wait_is_raised(self) -> None:
+        async def call():
+            raise FloodWaitError(request=None, capture=telegram._FLOOD_WAIT_MAX_SLEEP + 1)
+
+        with self.assertRaises(FloodWaitError):
+            asyncio.run(telegram._rpc(call))
+
+    def test_fast_calls_recover_concurrency_up_to_the_limit(self) -> None:
+        self.limiter.decrease()
+        self.assertEqual(self.limiter.cap, 2)
+
+        async def call():
+            return None
+
+        async def run_many():
+            for _ in range(20):
+                await telegram._rpc(call)
+
+        asyncio.run(run_many())
+
+        self.assertEqual(self.limiter.cap, 4)
+
+
+class InferMediaTypeTest(SimpleTestCase):
+    def test_maps_message_media_to_type(self) -> None:
+        cases = [
+            (SimpleNamespace(photo=True), "photo"),
+            (SimpleNamespace(photo=None, video=True), "video"),
+            (SimpleNamespace(photo=None, video=None, document=SimpleNamespace(mime_type="image/webp")), "photo"),
+            (SimpleNamespace(photo=None, video=None, document=SimpleNamespace(mime_type="video/mp4")), "video"),
+            (SimpleNamespace(photo=None, video=None, document=SimpleNamespace(mime_type="application/pdf")), "doc"),
+            (SimpleNamespace(photo=None, video=None, document=SimpleNamespace(mime_type=None)), "doc"),
+            (SimpleNamespace(), "doc"),
+        ]
+        for message, expected in cases:
+            with self.subTest(message=message):
+                self.assertEqual(telegram._infer_media_type(message), expected)
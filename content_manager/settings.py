@@ -177,6 +177,23 @@ def _database_config_from_env() -> dict:
 
 DATABASES = {"default": _database_config_from_env()}
 
+# Cache zapytań o kanały (django-cachalot). Unieważnianie musi być widoczne zarówno
+# dla procesów WWW, jak i workera Celery, dlatego cache działa tylko na Redisie.
+# Włączany wyłącznie jawnie – najlepiej osobna baza Redisa, nie baza brokera Celery.
+CACHALOT_REDIS_URL = os.getenv("CACHALOT_REDIS_URL", "")
+CACHALOT_ENABLED = bool(CACHALOT_REDIS_URL)
+if CACHALOT_ENABLED:
+    INSTALLED_APPS.append("cachalot")
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "cachalot": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHALOT_REDIS_URL,
+        },
+    }
+    CACHALOT_CACHE = "cachalot"
+    CACHALOT_ONLY_CACHABLE_TABLES = ("posts_channel",)
+
 CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 # Wymuszamy pojedynczy wątek/worker, aby zadania były zawsze wykonywane sekwencyjnie.